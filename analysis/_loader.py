@@ -0,0 +1,233 @@
+"""
+Shared data loading for the analysis modules and the dashboard.
+
+Every consumer needs the same daily_performance ⋈ products join, so the
+query lives here once. Results are memoized in-process for a short TTL
+and mirrored to a parquet file on disk, so repeated dashboard renders and
+CLI runs within the TTL skip Postgres entirely.
+"""
+import pandas as pd
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+from functools import lru_cache
+import glob
+import tempfile
+import time
+import os
+
+try:
+    import connectorx as cx
+except ImportError:  # optional — fall back to pandas + psycopg2
+    cx = None
+
+load_dotenv()
+
+CACHE_TTL_SECONDS = 300
+READ_CHUNKSIZE = 50_000
+CACHE_PATH = os.getenv("PERF_CACHE_PATH", "/tmp/perf_cache.parquet")
+
+
+def _performance_query(days_back=None, product=None, category=None):
+    """
+    The daily_performance ⋈ products join, narrowed in SQL. Product and
+    category are bound as :product / :category parameters by the caller.
+    """
+    # The date predicate is served by the (date, product_id) primary key
+    # index from init.sql, so no separate index on date is needed.
+    conditions = []
+    if days_back is not None:
+        conditions.append(f"dp.date >= CURRENT_DATE - INTERVAL '{int(days_back)} days'")
+    if product is not None:
+        conditions.append("p.name = :product")
+    if category is not None:
+        conditions.append("p.category = :category")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f"""
+        SELECT dp.date, p.name, p.category,
+               dp.impressions, dp.clicks,
+               dp.ad_spend, dp.units_sold, dp.revenue
+        FROM daily_performance dp
+        JOIN products p ON dp.product_id = p.id
+        {where}
+        ORDER BY dp.date;
+    """
+
+
+PRODUCT_CATALOG_QUERY = """
+    SELECT DISTINCT name, category
+    FROM products
+    ORDER BY name;
+"""
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def _db_url(driver="postgresql+psycopg2"):
+    return f"{driver}://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
+
+
+POOL_SIZE = 10
+POOL_MAX_OVERFLOW = 5
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """
+    One SQLAlchemy engine (and connection pool) per process, shared by the
+    dashboard's cached loaders, the forecasts and the CLI modules.
+    pool_pre_ping replaces connections the server dropped while idle.
+    """
+    return create_engine(
+        _db_url(),
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_pre_ping=True,
+    )
+
+
+def read_query(query, chunksize=None, params=None):
+    """
+    Run a SELECT and return a DataFrame. `params` binds :name
+    placeholders in the query.
+
+    Uses ConnectorX when installed: it fetches in Rust and writes straight
+    into the pandas buffers instead of converting rows one at a time
+    through psycopg2. ConnectorX cannot bind parameters, so parameterized
+    queries always go through SQLAlchemy. Otherwise, passing `chunksize`
+    streams the result through a server-side cursor so psycopg2 never
+    holds the whole result set in memory alongside the DataFrame being
+    built.
+    """
+    if cx is not None and not params:
+        return cx.read_sql(_db_url("postgresql"), query, return_type="pandas")
+    if chunksize is None:
+        return pd.read_sql(text(query), get_engine(), params=params)
+    with get_engine().connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql(text(query), conn, params=params, chunksize=chunksize)
+        return pd.concat(chunks, ignore_index=True)
+
+
+# ---------------------------------------------------------------------------
+# On-disk cache
+# ---------------------------------------------------------------------------
+
+def _cache_path(days_back=None):
+    """CACHE_PATH for the full history, a suffixed sibling for windows."""
+    if days_back is None:
+        return CACHE_PATH
+    root, ext = os.path.splitext(CACHE_PATH)
+    return f"{root}_{int(days_back)}d{ext}"
+
+
+def _read_cache_file(path):
+    """Return the parquet cache if it is younger than the TTL, else None."""
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TTL_SECONDS:
+            return pd.read_parquet(path)
+    except (OSError, ImportError, ValueError):
+        # Missing, unreadable or corrupt cache — fall back to the database.
+        pass
+    return None
+
+
+def _write_cache_file(df, path):
+    """
+    Write the parquet cache to a temp file beside `path`, then rename it
+    into place, so concurrent readers never see a half-written file.
+    """
+    tmp = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or ".", suffix=".tmp", delete=False) as f:
+            tmp = f.name
+            df.to_parquet(f, index=False)
+        os.replace(tmp, path)
+    except (OSError, ImportError, ValueError):
+        # The cache is an optimization only; never fail a load over it.
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+COUNT_COLUMNS = ["impressions", "clicks", "units_sold"]
+MONEY_COLUMNS = ["ad_spend", "revenue"]
+LABEL_COLUMNS = ["name", "category"]
+
+
+def _downcast(df):
+    """
+    Store counts as int32: daily counts are far below 2**31, so nothing is
+    lost and every downstream scan moves half the bytes. Count columns
+    with NULLs stay float64 instead of failing.
+
+    Money stays float64. float32 holds a single day's revenue exactly to
+    the cent, but the sums built from it (top sellers, revenue trends,
+    the forecast series) run out of precision long before they reach
+    multi-million totals.
+
+    Product name and category become categoricals, so every
+    groupby("name") works on small integer codes instead of hashing
+    Python strings row by row. Group with observed=True.
+    """
+    dtypes = {c: "float64" if df[c].isna().any() else "int32" for c in COUNT_COLUMNS}
+    dtypes.update(dict.fromkeys(MONEY_COLUMNS, "float64"))
+    dtypes.update(dict.fromkeys(LABEL_COLUMNS, "category"))
+    return df.astype(dtypes)
+
+
+@lru_cache(maxsize=32)
+def _load_cached(ttl_bucket, days_back, product, category):
+    # Only unfiltered loads are mirrored to disk; filtered ones are small
+    # and there can be one per product, so they stay in memory only.
+    filtered = product is not None or category is not None
+    path = None if filtered else _cache_path(days_back)
+    df = _read_cache_file(path) if path else None
+    if df is None:
+        params = {k: v for k, v in (("product", product), ("category", category)) if v is not None}
+        df = read_query(
+            _performance_query(days_back, product, category),
+            chunksize=READ_CHUNKSIZE, params=params,
+        )
+        df["date"] = pd.to_datetime(df["date"])
+        df = _downcast(df)
+        if path:
+            _write_cache_file(df, path)
+    return df
+
+
+def load_performance(days_back=None, product=None, category=None):
+    """
+    Daily performance data: date, name, category, impressions, clicks,
+    ad_spend, units_sold, revenue — ordered by date. With `days_back`,
+    only the last `days_back` days are fetched; `product` / `category`
+    keep only matching rows. All filtering happens in SQL.
+
+    Cached for CACHE_TTL_SECONDS. The returned frame is a shallow copy of
+    the cached one, so callers may add or replace columns freely but
+    should not modify values in place.
+    """
+    bucket = int(time.time() // CACHE_TTL_SECONDS)
+    return _load_cached(bucket, days_back, product, category).copy(deep=False)
+
+
+def load_product_catalog():
+    """Distinct (name, category) pairs from products, ordered by name."""
+    return read_query(PRODUCT_CATALOG_QUERY)
+
+
+def clear_cache():
+    """Drop both the in-process and the on-disk caches."""
+    _load_cached.cache_clear()
+    root, ext = os.path.splitext(CACHE_PATH)
+    for path in glob.glob(f"{root}*{ext}"):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,74 +1,142 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
+from analysis._loader import load_performance
+
+try:
+    from numba import njit
+except ImportError:  # optional — fall back to pandas' rolling kernels
+    njit = None
 
 
 # ---------------------------------------------------------------------------
-# Data loading
+# Core detection — used by both dashboard and CLI
 # ---------------------------------------------------------------------------
 
-def load_data():
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
-    query = """
-        SELECT dp.date, p.name, p.category,
-               dp.impressions, dp.clicks,
-               dp.ad_spend, dp.units_sold, dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date;
+BASELINE_DAYS = 28   # rolling window the z-score is measured against
+MIN_HISTORY   = 14   # minimum observations before a day can be flagged
+HISTORY_DAYS  = 90   # loaded window; comfortably covers baseline + window
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _recent_rolling_stats(starts, ends, revenue, days, cutoff, window, min_periods):
+        """
+        Rolling mean/std (ddof=1, NaNs skipped) of the last `window` rows
+        per group, for rows dated on or after `cutoff` only — the only
+        rows detect_anomalies can flag. Serial on purpose: only the rows
+        at the cutoff are computed, and a parallel kernel would abort the
+        process when Streamlit sessions call it concurrently under numba's
+        default (workqueue) threading layer.
+        """
+        n = revenue.shape[0]
+        mean = np.full(n, np.nan)
+        std  = np.full(n, np.nan)
+        for g in range(starts.shape[0]):
+            for i in range(starts[g], ends[g]):
+                if days[i] < cutoff:
+                    continue
+                lo = max(starts[g], i - window + 1)
+                count, total = 0, 0.0
+                low, high = np.inf, -np.inf
+                for j in range(lo, i + 1):
+                    v = revenue[j]
+                    if not np.isnan(v):
+                        count += 1
+                        total += v
+                        low, high = min(low, v), max(high, v)
+                if count < min_periods:
+                    continue
+                mu = total / count
+                mean[i] = mu
+                if low == high:
+                    # Same as pandas: a flat window has exactly zero spread.
+                    std[i] = 0.0
+                    continue
+                ss = 0.0
+                for j in range(lo, i + 1):
+                    v = revenue[j]
+                    if not np.isnan(v):
+                        ss += (v - mu) ** 2
+                std[i] = np.sqrt(ss / (count - 1))
+        return mean, std
+
+
+def _rolling_stats(df, days, cutoff):
     """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
+    Rolling BASELINE_DAYS revenue mean and std for each row of `df`
+    (sorted by name, date), aligned positionally. `days` holds the row
+    dates as int64 day numbers; rows before day `cutoff` may be left NaN.
+    Uses the numba kernel when available; otherwise pandas' C rolling
+    kernels over every row.
+    """
+    revenue = df["revenue"].to_numpy(dtype=np.float64)
+    if njit is not None and len(df):
+        # Loaded frames carry name as a categorical, whose integer codes
+        # already identify the (contiguous, after sorting) product runs.
+        if isinstance(df["name"].dtype, pd.CategoricalDtype):
+            codes = df["name"].cat.codes.to_numpy()
+        else:
+            codes = pd.factorize(df["name"])[0]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends   = np.r_[starts[1:], len(codes)]
+        return _recent_rolling_stats(starts, ends, revenue, days, cutoff,
+                                     BASELINE_DAYS, MIN_HISTORY)
+
+    roll = df.groupby("name", observed=True)["revenue"].rolling(BASELINE_DAYS, min_periods=MIN_HISTORY)
+    mean = roll.mean().droplevel(0).sort_index().to_numpy()
+    std  = roll.std().droplevel(0).sort_index().to_numpy()
+    return mean, std
 
-# ---------------------------------------------------------------------------
-# Core detection — used by both dashboard and CLI
-# ---------------------------------------------------------------------------
 
 def detect_anomalies(df, z_threshold=1.8, window_days=7):
     """
     For each product, flag any day in the last `window_days` where
     revenue deviates more than `z_threshold` standard deviations
-    from that product's historical mean.
+    from that product's rolling BASELINE_DAYS mean. A rolling baseline
+    adapts to trend and seasonality drift that a full-history mean
+    would misreport as anomalies.
 
-    Returns a list of dicts sorted by |Z-Score| descending, ready
-    to be passed directly to pd.DataFrame() for display.
+    Returns a DataFrame (Product, Category, Date, Revenue, Expected,
+    Z-Score, Type) sorted by |Z-Score| descending, ready for display.
     """
-    anomalies = []
-    latest_date = df["date"].max()
-    cutoff = latest_date - pd.Timedelta(days=window_days - 1)
-
-    for product, df_product in df.groupby("name"):
-        df_product = df_product.sort_values("date")
-        if len(df_product) < 14:
-            continue
-
-        mean = df_product["revenue"].mean()
-        std  = df_product["revenue"].std()
-        if std == 0:
-            continue
-
-        recent = df_product[df_product["date"] >= cutoff]
-        for _, row in recent.iterrows():
-            z = (row["revenue"] - mean) / std
-            if abs(z) > z_threshold:
-                anomalies.append({
-                    "Product":  product,
-                    "Category": row["category"],
-                    "Date":     row["date"].strftime("%b %d"),
-                    "Revenue":  f"${row['revenue']:,.0f}",
-                    "Expected": f"${mean:,.0f} ± ${std:,.0f}",
-                    "Z-Score":  round(z, 2),
-                    "Type":     "📈 Spike" if z > 0 else "📉 Drop",
-                })
-
-    return sorted(anomalies, key=lambda x: abs(x["Z-Score"]), reverse=True)
+    df = df.dropna(subset=["name"]).sort_values(["name", "date"]).reset_index(drop=True)
+    # Dates as int64 day numbers, so the window test is a plain integer
+    # compare rather than a Timestamp comparison.
+    days   = df["date"].to_numpy("datetime64[D]").view(np.int64)
+    cutoff = (days.max() if len(days) else 0) - (window_days - 1)
+
+    # Rolling per-product stats aligned back onto every row, so the
+    # threshold test below is one vectorized mask instead of a Python
+    # loop over products and rows.
+    mean, std = _rolling_stats(df, days, cutoff)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (df["revenue"].to_numpy(dtype=np.float64) - mean) / std
+
+    mask = (
+        (days >= cutoff)
+        & (std > 0)
+        & (np.abs(z) > z_threshold)
+    )
+    hits = df.loc[mask, ["name", "category", "date", "revenue"]]
+    mean, std, z = mean[mask], std[mask], z[mask].round(2)
+
+    # Format whole columns at once rather than one dict per anomaly.
+    def money(values):
+        return pd.Series(values, dtype=object).map("${:,.0f}".format)
+
+    anomalies = pd.DataFrame({
+        "Product":  hits["name"].to_numpy(dtype=object),
+        "Category": hits["category"].to_numpy(dtype=object),
+        "Date":     hits["date"].dt.strftime("%b %d").to_numpy(),
+        "Revenue":  money(hits["revenue"].to_numpy()).to_numpy(),
+        "Expected": (money(mean) + " ± " + money(std)).to_numpy(),
+        "Z-Score":  z,
+        "Type":     np.where(z > 0, "📈 Spike", "📉 Drop"),
+    })
+
+    order = np.argsort(-np.abs(z), kind="stable")
+    return anomalies.iloc[order].reset_index(drop=True)
 
 
 # ---------------------------------------------------------------------------
@@ -76,12 +144,12 @@ def detect_anomalies(df, z_threshold=1.8, window_days=7):
 # ---------------------------------------------------------------------------
 
 def run_anomaly_detection():
-    df = load_data()
+    df = load_performance(days_back=HISTORY_DAYS)
     anomalies = detect_anomalies(df)
-    if not anomalies:
+    if anomalies.empty:
         print("No anomalies detected.")
     else:
-        for a in anomalies:
+        for a in anomalies.to_dict("records"):
             print(f"\n{a['Type']} {a['Product']} on {a['Date']}")
             print(f"  Revenue:  {a['Revenue']}  (expected {a['Expected']})")
             print(f"  Z-Score:  {a['Z-Score']}")
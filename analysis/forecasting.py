@@ -1,30 +1,76 @@
 import pandas as pd
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from joblib import Memory
+from datetime import timedelta
 import os
 
-# Load env
-load_dotenv()
+from analysis._loader import load_performance
 
-def forecast_revenue(days=30, product_filter="All", category_filter="All"):
+# Fitted ARIMA models are cached on disk keyed by a hash of the training
+# series, so re-rendering a forecast for unchanged data (same filter, no
+# new ETL load) skips the auto_arima search entirely — across processes.
+_memory = Memory(os.getenv("FORECAST_CACHE_DIR", "/tmp/forecast_cache"), verbose=0)
+
+# Every ETL day and every product/category filter yields a new training
+# series, so old entries are never hit again. Keep the newest few and
+# drop anything older than a couple of loads.
+FORECAST_CACHE_MAX_ITEMS = 64
+FORECAST_CACHE_MAX_AGE   = timedelta(days=2)
+
+
+@_memory.cache
+def _fit_arima(y):
     """
-    Forecast revenue for the next `days` days using ARIMA.
-    Optionally filter by product name or category.
-    Returns a dataframe with: ds, yhat, yhat_lower, yhat_upper.
+    auto_arima tests different (p,d,q) combinations and picks the best one
+    using AIC. Much more robust than a fixed order on volatile data.
     """
+    from pmdarima import auto_arima
+    return auto_arima(
+        y,
+        seasonal=True,
+        m=7,                # weekly seasonality
+        stepwise=True,      # faster search
+        suppress_warnings=True,
+        error_action="ignore",
+        max_p=2, max_q=2,   # keep it simple to avoid overfitting
+    )
 
-    # --- Step 1: Load aggregated revenue data ---
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
 
-    query = """
-        SELECT dp.date, p.name, p.category, dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date
+def _history_and_forecast(history_ds, history_y, future_ds, yhat, lower, upper):
+    """
+    Columns for one history-then-forecast frame, filled into preallocated
+    float arrays. History rows get NaN confidence bounds, so every column
+    stays float64 instead of going through an object-dtype concat.
+    """
+    n, m = len(history_ds), len(future_ds)
+    y = np.empty(n + m)
+    y[:n], y[n:] = history_y, yhat
+    y_lower = np.full(n + m, np.nan)
+    y_upper = np.full(n + m, np.nan)
+    y_lower[n:], y_upper[n:] = lower, upper
+    return {
+        "ds":         np.concatenate([np.asarray(history_ds), np.asarray(future_ds)]),
+        "yhat":       y,
+        "yhat_lower": y_lower,
+        "yhat_upper": y_upper,
+    }
+
+
+@lru_cache(maxsize=1)
+def _pool():
     """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
+    The thread pool forecast_both() runs its two models on, one worker
+    per model. Created on first use, so importers that never forecast
+    (the CLIs, KPI and recommendation scripts) start no threads.
+    """
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="forecast")
+
+
+def _load_series(product_filter="All", category_filter="All"):
+    """Daily total revenue for the selected product or category, indexed by date."""
+    df = load_performance()
 
     # Apply filters
     if product_filter and product_filter != "All":
@@ -32,108 +78,89 @@ def forecast_revenue(days=30, product_filter="All", category_filter="All"):
     elif category_filter and category_filter != "All":
         df = df[df["category"] == category_filter]
 
-    # Aggregate by date
-    df = df.groupby("date")["revenue"].sum().reset_index()
-    df.columns = ["ds", "y"]
-    df = df.set_index("ds")
+    return df.groupby("date")["revenue"].sum()
+
+
+def _arima_forecast(series, days):
+    df = series.rename("y").rename_axis("ds").to_frame()
     df.index.freq = pd.infer_freq(df.index)
 
     # Validate minimum data requirements after filtering
     if len(df) < 10:
         raise ValueError(f"Not enough data to train ARIMA for the selected filter. Got {len(df)} rows, need at least 10.")
 
-    # --- Step 2: Fit ARIMA model with automatic parameter selection ---
-    # auto_arima tests different (p,d,q) combinations and picks the best one
-    # using AIC. Much more robust than a fixed order on volatile data.
-    from pmdarima import auto_arima
-    model = auto_arima(
-        df["y"],
-        seasonal=True,
-        m=7,                # weekly seasonality
-        stepwise=True,      # faster search
-        suppress_warnings=True,
-        error_action="ignore",
-        max_p=3, max_q=3,   # keep it simple to avoid overfitting
-    )
-    result = model
+    # --- Fit ARIMA model with automatic parameter selection ---
+    result = _fit_arima(df["y"])
+    # Evict stale entries after every call; with at most
+    # FORECAST_CACHE_MAX_ITEMS entries the scan is cheap.
+    _memory.reduce_size(items_limit=FORECAST_CACHE_MAX_ITEMS, age_limit=FORECAST_CACHE_MAX_AGE)
 
-    # --- Step 3: Generate forecast with 80% confidence interval ---
+    # --- Generate forecast with 80% confidence interval ---
     forecast_mean, conf_int = result.predict(n_periods=days, return_conf_int=True, alpha=0.20)
 
-    # --- Step 4: Build future dataframe ---
+    # --- Build future dataframe ---
     future_dates = pd.date_range(
         start=df.index[-1] + pd.Timedelta(days=1),
         periods=days,
         freq="D"
     )
-    forecast_df = pd.DataFrame({
-        "ds": future_dates,
-        "yhat": forecast_mean,
-        "yhat_lower": conf_int[:, 0],
-        "yhat_upper": conf_int[:, 1],
-        "is_forecast": True,
-    })
-
-    # Include historical data so the plot shows context
-    history_df = pd.DataFrame({
-        "ds": df.index,
-        "yhat": df["y"].values,
-        "yhat_lower": None,
-        "yhat_upper": None,
-        "is_forecast": False,
-    })
-
-    return pd.concat([history_df, forecast_df], ignore_index=True)
-
-def forecast_revenue_ma(days=30, product_filter="All", category_filter="All", window=7):
-    """
-    Forecast revenue using a Rolling Mean (Moving Average) model.
-    Simpler and faster than ARIMA — useful as a baseline comparison.
-    Returns a dataframe with: ds, yhat, yhat_lower, yhat_upper.
-    """
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
-
-    query = """
-        SELECT dp.date, p.name, p.category, dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date
-    """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
-
-    if product_filter and product_filter != "All":
-        df = df[df["name"] == product_filter]
-    elif category_filter and category_filter != "All":
-        df = df[df["category"] == category_filter]
+    # Historical rows come first so the plot shows context
+    columns = _history_and_forecast(
+        df.index, df["y"].to_numpy(), future_dates,
+        forecast_mean, conf_int[:, 0], conf_int[:, 1],
+    )
+    columns["is_forecast"] = np.arange(len(columns["ds"])) >= len(df)
+    return pd.DataFrame(columns)
 
-    df = df.groupby("date")["revenue"].sum().reset_index()
 
-    if len(df) < window:
-        raise ValueError(f"Not enough data for MA forecast. Got {len(df)} rows, need at least {window}.")
+def _ma_forecast(series, days, window):
+    if len(series) < window:
+        raise ValueError(f"Not enough data for MA forecast. Got {len(series)} rows, need at least {window}.")
 
     # Rolling mean and std over the last `window` days
-    rolling_mean = df["revenue"].rolling(window).mean().iloc[-1]
-    rolling_std  = df["revenue"].rolling(window).std().iloc[-1]
+    rolling_mean = series.rolling(window).mean().iloc[-1]
+    rolling_std  = series.rolling(window).std().iloc[-1]
 
     future_dates = pd.date_range(
-        start=df["date"].iloc[-1] + pd.Timedelta(days=1),
+        start=series.index[-1] + pd.Timedelta(days=1),
         periods=days, freq="D"
     )
 
-    forecast_df = pd.DataFrame({
-        "ds":         future_dates,
-        "yhat":       rolling_mean,
-        "yhat_lower": rolling_mean - 1.28 * rolling_std,  # 80% CI
-        "yhat_upper": rolling_mean + 1.28 * rolling_std,
-    })
-
-    history_df = pd.DataFrame({
-        "ds":         df["date"],
-        "yhat":       df["revenue"],
-        "yhat_lower": None,
-        "yhat_upper": None,
-    })
-
-    return pd.concat([history_df, forecast_df], ignore_index=True)
\ No newline at end of file
+    columns = _history_and_forecast(
+        series.index, series.to_numpy(), future_dates,
+        rolling_mean,
+        rolling_mean - 1.28 * rolling_std,  # 80% CI
+        rolling_mean + 1.28 * rolling_std,
+    )
+    return pd.DataFrame(columns)
+
+
+def forecast_revenue(days=30, product_filter="All", category_filter="All"):
+    """
+    Forecast revenue for the next `days` days using ARIMA.
+    Optionally filter by product name or category.
+    Returns a dataframe with: ds, yhat, yhat_lower, yhat_upper.
+    """
+    return _arima_forecast(_load_series(product_filter, category_filter), days)
+
+
+def forecast_revenue_ma(days=30, product_filter="All", category_filter="All", window=7):
+    """
+    Forecast revenue using a Rolling Mean (Moving Average) model.
+    Simpler and faster than ARIMA — useful as a baseline comparison.
+    Returns a dataframe with: ds, yhat, yhat_lower, yhat_upper.
+    """
+    return _ma_forecast(_load_series(product_filter, category_filter), days, window)
+
+
+def forecast_both(days=30, product_filter="All", category_filter="All", window=7):
+    """
+    (forecast_revenue, forecast_revenue_ma) for the same filter, with the
+    revenue series loaded and aggregated once for both models.
+    """
+    series = _load_series(product_filter, category_filter)
+    # The ARIMA fit spends most of its time in statsmodels' linear algebra,
+    # which releases the GIL, so the two models overlap on the pool.
+    arima = _pool().submit(_arima_forecast, series, days)
+    ma    = _pool().submit(_ma_forecast, series, days, window)
+    return arima.result(), ma.result()
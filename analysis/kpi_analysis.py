@@ -1,51 +1,34 @@
-import pandas as pd
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-import os
+import numpy as np
 
-load_dotenv()
+from analysis._loader import load_performance, read_query
 
 
 # ---------------------------------------------------------------------------
-# Data loading
+# KPI calculation
 # ---------------------------------------------------------------------------
 
-def load_performance_data():
-    """Load full daily performance data including category."""
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
-    query = """
-        SELECT
-            dp.date,
-            p.name,
-            p.category,
-            dp.impressions,
-            dp.clicks,
-            dp.ad_spend,
-            dp.units_sold,
-            dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date;
-    """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
+def _safe_ratio(num, den):
+    """num / den element-wise; a zero denominator counts as 1, so the
+    numerator is returned for those rows."""
+    return np.divide(num, den, out=num.copy(), where=den != 0)
 
-# ---------------------------------------------------------------------------
-# KPI calculation
-# ---------------------------------------------------------------------------
 
 def calculate_kpis(df):
     """Add CTR, conversion rate, ROAS, ACOS and CPC columns to the dataframe."""
-    df = df.copy()
-    df["CTR"]             = df["clicks"]    / df["impressions"].replace({0: 1})
-    df["conversion_rate"] = df["units_sold"] / df["clicks"].replace({0: 1})
-    df["ROAS"]            = df["revenue"]   / df["ad_spend"].replace({0: 1})
-    df["ACOS"]            = df["ad_spend"]  / df["revenue"].replace({0: 1})
-    df["CPC"]             = df["ad_spend"]  / df["clicks"].replace({0: 1})  # Cost Per Click
-    return df
+    impressions = df["impressions"].to_numpy(dtype=np.float64)
+    clicks      = df["clicks"].to_numpy(dtype=np.float64)
+    ad_spend    = df["ad_spend"].to_numpy(dtype=np.float64)
+    units_sold  = df["units_sold"].to_numpy(dtype=np.float64)
+    revenue     = df["revenue"].to_numpy(dtype=np.float64)
+
+    # assign() returns a new frame, so the input is never mutated.
+    return df.assign(
+        CTR             = _safe_ratio(clicks,     impressions),
+        conversion_rate = _safe_ratio(units_sold, clicks),
+        ROAS            = _safe_ratio(revenue,    ad_spend),
+        ACOS            = _safe_ratio(ad_spend,   revenue),
+        CPC             = _safe_ratio(ad_spend,   clicks),  # Cost Per Click
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -54,12 +37,8 @@ def calculate_kpis(df):
 
 def get_top_sellers(df, top_n=5):
     """Top N products by total revenue."""
-    return (
-        df.groupby("name")["revenue"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(top_n)
-    )
+    # nlargest is a partial selection; no need to sort every product.
+    return df.groupby("name", observed=True)["revenue"].sum().nlargest(top_n)
 
 
 def get_worst_performers(df, top_n=5):
@@ -67,15 +46,12 @@ def get_worst_performers(df, top_n=5):
     Bottom N products by ROAS (worst return on ad spend).
     Only includes products with non-zero ad spend to avoid skewed results.
     """
-    product_roas = (
+    sums = (
         df[df["ad_spend"] > 0]
-        .groupby("name")
-        .apply(lambda g: g["revenue"].sum() / g["ad_spend"].sum(), include_groups=False)
-        .rename("ROAS")
-        .sort_values(ascending=True)
-        .head(top_n)
+        .groupby("name", observed=True)[["revenue", "ad_spend"]]
+        .sum()
     )
-    return product_roas
+    return (sums["revenue"] / sums["ad_spend"]).rename("ROAS").nsmallest(top_n)
 
 
 # ---------------------------------------------------------------------------
@@ -87,15 +63,14 @@ def calculate_day_over_day_change(df):
     Revenue % change for each product: latest day vs previous day.
     Returns a Series sorted descending, or None if not enough data.
     """
-    sorted_dates = sorted(df["date"].unique())
-    if len(sorted_dates) < 2:
+    unique_dates = np.unique(df["date"].to_numpy())  # already sorted
+    if unique_dates.size < 2:
         return None
 
-    latest_date   = sorted_dates[-1]
-    previous_date = sorted_dates[-2]
+    latest_date, previous_date = unique_dates[-1], unique_dates[-2]
 
-    latest   = df[df["date"] == latest_date].groupby("name")["revenue"].sum()
-    previous = df[df["date"] == previous_date].groupby("name")["revenue"].sum()
+    latest   = df[df["date"] == latest_date].groupby("name", observed=True)["revenue"].sum()
+    previous = df[df["date"] == previous_date].groupby("name", observed=True)["revenue"].sum()
     change   = ((latest - previous) / previous.replace({0: 1})) * 100
 
     return change.sort_values(ascending=False)
@@ -108,22 +83,18 @@ def calculate_week_over_week_change(df):
     Returns a DataFrame with columns: product, this_week, last_week, change_pct.
     """
     latest_date = df["date"].max()
-    this_week_start = latest_date - pd.Timedelta(days=6)
-    last_week_start = latest_date - pd.Timedelta(days=13)
-    last_week_end   = latest_date - pd.Timedelta(days=7)
-
-    this_week = (
-        df[df["date"] >= this_week_start]
-        .groupby("name")["revenue"].sum()
-        .rename("this_week")
-    )
-    last_week = (
-        df[(df["date"] >= last_week_start) & (df["date"] <= last_week_end)]
-        .groupby("name")["revenue"].sum()
-        .rename("last_week")
+    days_ago    = (latest_date - df["date"]).dt.days
+    recent      = days_ago < 14
+
+    # One scan: label each recent row with its week, then a single groupby.
+    week = np.where(days_ago[recent] < 7, "this_week", "last_week")
+    combined = (
+        df.loc[recent, "revenue"]
+        .groupby([df.loc[recent, "name"], week], observed=True)
+        .sum()
+        .unstack(fill_value=0)
+        .reindex(columns=["this_week", "last_week"], fill_value=0)
     )
-
-    combined = pd.concat([this_week, last_week], axis=1).fillna(0)
     combined["change_pct"] = (
         (combined["this_week"] - combined["last_week"])
         / combined["last_week"].replace({0: 1})
@@ -136,23 +107,9 @@ def calculate_week_over_week_change(df):
 # Aggregated summary (for dashboard consumption)
 # ---------------------------------------------------------------------------
 
-def get_kpi_summary(df):
-    """
-    Returns a flat dict of aggregated KPIs across all products,
-    ready to be consumed directly by the dashboard or any other UI.
-
-    Keys: total_revenue, total_ad_spend, total_clicks, total_impressions,
-          total_units_sold, avg_roas, avg_acos, avg_ctr, avg_cpc,
-          avg_conversion_rate, revenue_per_unit
-    """
-    df = calculate_kpis(df)
-
-    total_revenue     = df["revenue"].sum()
-    total_ad_spend    = df["ad_spend"].sum()
-    total_clicks      = df["clicks"].sum()
-    total_impressions = df["impressions"].sum()
-    total_units_sold  = df["units_sold"].sum()
-
+def _summarize_totals(total_revenue, total_ad_spend, total_clicks,
+                      total_impressions, total_units_sold):
+    """Turn the five raw totals into the flat KPI summary dict."""
     return {
         "total_revenue":       round(total_revenue, 2),
         "total_ad_spend":      round(total_ad_spend, 2),
@@ -168,25 +125,101 @@ def get_kpi_summary(df):
     }
 
 
+def get_kpi_summary(df):
+    """
+    Returns a flat dict of aggregated KPIs across all products,
+    ready to be consumed directly by the dashboard or any other UI.
+
+    Keys: total_revenue, total_ad_spend, total_clicks, total_impressions,
+          total_units_sold, avg_roas, avg_acos, avg_ctr, avg_cpc,
+          avg_conversion_rate, revenue_per_unit
+    """
+    # Accumulate in float64 so totals of the int32 count columns cannot
+    # overflow; nansum skips NULL counts.
+    def total(col):
+        return float(np.nansum(df[col].to_numpy(), dtype=np.float64))
+
+    return _summarize_totals(
+        total_revenue     = total("revenue"),
+        total_ad_spend    = total("ad_spend"),
+        total_clicks      = total("clicks"),
+        total_impressions = total("impressions"),
+        total_units_sold  = total("units_sold"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Database-side aggregation
+#
+# When only totals or a top-N list are needed, let PostgreSQL do the scan
+# and ship back a handful of numbers instead of every daily row.
+# ---------------------------------------------------------------------------
+
+def load_kpi_totals():
+    """1-row DataFrame with the five totals get_kpi_summary is built from."""
+    query = """
+        SELECT
+            COALESCE(SUM(revenue), 0)     AS total_revenue,
+            COALESCE(SUM(ad_spend), 0)    AS total_ad_spend,
+            COALESCE(SUM(clicks), 0)      AS total_clicks,
+            COALESCE(SUM(impressions), 0) AS total_impressions,
+            COALESCE(SUM(units_sold), 0)  AS total_units_sold
+        FROM daily_performance;
+    """
+    return read_query(query)
+
+
+def get_kpi_summary_from_db():
+    """Same dict as get_kpi_summary(), aggregated in the database."""
+    totals = load_kpi_totals().iloc[0]
+    return _summarize_totals(**{k: float(v) for k, v in totals.items()})
+
+
+def load_top_sellers(top_n=5):
+    """Top N products by total revenue, aggregated in the database."""
+    query = f"""
+        SELECT p.name, SUM(dp.revenue) AS revenue
+        FROM daily_performance dp
+        JOIN products p ON dp.product_id = p.id
+        GROUP BY p.name
+        ORDER BY revenue DESC
+        LIMIT {int(top_n)};
+    """
+    return read_query(query).set_index("name")["revenue"].astype(float)
+
+
+def load_worst_performers(top_n=5):
+    """Bottom N products by ROAS, aggregated in the database."""
+    query = f"""
+        SELECT p.name, SUM(dp.revenue) / SUM(dp.ad_spend) AS roas
+        FROM daily_performance dp
+        JOIN products p ON dp.product_id = p.id
+        WHERE dp.ad_spend > 0
+        GROUP BY p.name
+        ORDER BY roas ASC
+        LIMIT {int(top_n)};
+    """
+    return read_query(query).set_index("name")["roas"].astype(float).rename("ROAS")
+
+
 # ---------------------------------------------------------------------------
 # Main (CLI usage)
 # ---------------------------------------------------------------------------
 
 def run_kpi_analysis():
-    print("Loading performance data...")
-    df = load_performance_data()
-    df = calculate_kpis(df)
-
     print("\n── KPI Summary ──────────────────────────")
-    summary = get_kpi_summary(df)
+    summary = get_kpi_summary_from_db()
     for key, value in summary.items():
         print(f"  {key:<25} {value}")
 
     print("\n── Top 5 Sellers ────────────────────────")
-    print(get_top_sellers(df).to_string())
+    print(load_top_sellers().to_string())
 
     print("\n── Worst 5 Performers (ROAS) ────────────")
-    print(get_worst_performers(df).to_string())
+    print(load_worst_performers().to_string())
+
+    print("\nLoading performance data...")
+    df = load_performance()
 
     print("\n── Day-over-Day Revenue Change ──────────")
     dod = calculate_day_over_day_change(df)
@@ -1,52 +1,37 @@
 import pandas as pd
-from sqlalchemy import create_engine
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
-
-
-def load_data():
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
-    query = """
-        SELECT
-            dp.date,
-            p.name,
-            p.category,
-            dp.impressions,
-            dp.clicks,
-            dp.ad_spend,
-            dp.units_sold,
-            dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date;
-    """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
-    df["CTR"] = df["clicks"] / df["impressions"].replace(0, 1)
-    df["conversion_rate"] = df["units_sold"] / df["clicks"].replace(0, 1)
-    df["ROAS"] = df["revenue"] / df["ad_spend"].replace(0, 1)
-    df["ACOS"] = df["ad_spend"] / df["revenue"].replace(0, 1)
-    return df
-
-
-def _week_avg(df_product, latest_date, week_offset=0):
-    """Return the mean of each metric for a given 7-day window.
+from itertools import chain
+from joblib import Parallel, delayed
+
+from analysis._loader import load_performance
+
+
+WEEK_METRICS = ["CTR", "conversion_rate", "ROAS", "ACOS", "revenue"]
+HISTORY_DAYS = 90  # loaded window; only the last 14 days are compared
+PARALLEL_MIN_PRODUCTS = 200
+
+
+def _weekly_averages(df, latest_date):
+    """Return the mean of each metric per product for the last two 7-day
+    windows, as a DataFrame indexed by product with (metric, week) columns.
     Metrics are computed here from raw columns so the function works
     with any DataFrame regardless of whether KPIs were pre-calculated.
-    week_offset=0 → last 7 days, week_offset=1 → previous 7 days."""
-    end   = latest_date - pd.Timedelta(days=7 * week_offset)
-    start = end - pd.Timedelta(days=6)
-    w = df_product[(df_product["date"] >= start) & (df_product["date"] <= end)].copy()
-    if w.empty:
-        return None
-    w["CTR"]             = w["clicks"]     / w["impressions"].replace(0, 1)
-    w["conversion_rate"] = w["units_sold"] / w["clicks"].replace(0, 1)
-    w["ROAS"]            = w["revenue"]    / w["ad_spend"].replace(0, 1)
-    w["ACOS"]            = w["ad_spend"]   / w["revenue"].replace(0, 1)
-    return w[["CTR", "conversion_rate", "ROAS", "ACOS", "revenue"]].mean()
+    week 0 → last 7 days, week 1 → previous 7 days."""
+    week = (latest_date - df["date"]).dt.days // 7
+    in_range = (week >= 0) & (week <= 1)
+    w = df.loc[in_range, ["name", "clicks", "impressions", "units_sold", "ad_spend", "revenue"]]
+    w = w.assign(
+        week            = week[in_range],
+        CTR             = w["clicks"]     / w["impressions"].replace(0, 1),
+        conversion_rate = w["units_sold"] / w["clicks"].replace(0, 1),
+        ROAS            = w["revenue"]    / w["ad_spend"].replace(0, 1),
+        ACOS            = w["ad_spend"]   / w["revenue"].replace(0, 1),
+    )
+    return (
+        w.groupby(["name", "week"], observed=True)[WEEK_METRICS]
+        .mean()
+        .unstack("week")
+        .reindex(columns=pd.MultiIndex.from_product([WEEK_METRICS, [0, 1]]))
+    )
 
 
 def _trend_arrow(current, previous, higher_is_better=True):
@@ -62,111 +47,128 @@ def _trend_arrow(current, previous, higher_is_better=True):
         return ("📉", f"+{pct:.1f}%") if pct > 0 else ("📈", f"{pct:.1f}%")
 
 
+def _product_recommendations(product, category, this_week, last_week):
+    """Recommendation dicts for one product from its weekly averages."""
+    recommendations = []
+
+    lw = None if pd.isna(last_week["revenue"]) else last_week  # shorthand
+
+    # --- ACOS too high ---
+    if this_week["ACOS"] > 0.35:
+        arrow, trend_label = _trend_arrow(
+            this_week["ACOS"],
+            lw["ACOS"] if lw is not None else None,
+            higher_is_better=False
+        )
+        recommendations.append({
+            "Product": product,
+            "Category": category,
+            "Alert": "⚠️ High ACOS",
+            "Type": "warning",
+            "Metric": "ACOS",
+            "This Week": f"{this_week['ACOS']:.1%}",
+            "Last Week": f"{lw['ACOS']:.1%}" if lw is not None else "—",
+            "Trend": f"{arrow} {trend_label}",
+            "Action": "Reduce bids or pause low-converting keywords.",
+        })
+
+    # --- ROAS strong ---
+    if this_week["ROAS"] > 4:
+        arrow, trend_label = _trend_arrow(
+            this_week["ROAS"],
+            lw["ROAS"] if lw is not None else None,
+            higher_is_better=True
+        )
+        recommendations.append({
+            "Product": product,
+            "Category": category,
+            "Alert": "🚀 Strong ROAS",
+            "Type": "success",
+            "Metric": "ROAS",
+            "This Week": f"{this_week['ROAS']:.2f}x",
+            "Last Week": f"{lw['ROAS']:.2f}x" if lw is not None else "—",
+            "Trend": f"{arrow} {trend_label}",
+            "Action": "Scale ad budget to capture more demand.",
+        })
+
+    # --- CTR low ---
+    if this_week["CTR"] < 0.02:
+        arrow, trend_label = _trend_arrow(
+            this_week["CTR"],
+            lw["CTR"] if lw is not None else None,
+            higher_is_better=True
+        )
+        recommendations.append({
+            "Product": product,
+            "Category": category,
+            "Alert": "🖼️ Low CTR",
+            "Type": "warning",
+            "Metric": "CTR",
+            "This Week": f"{this_week['CTR']:.2%}",
+            "Last Week": f"{lw['CTR']:.2%}" if lw is not None else "—",
+            "Trend": f"{arrow} {trend_label}",
+            "Action": "A/B test main image or rewrite product title.",
+        })
+
+    # --- Conversion rate low ---
+    if this_week["conversion_rate"] < 0.08:
+        arrow, trend_label = _trend_arrow(
+            this_week["conversion_rate"],
+            lw["conversion_rate"] if lw is not None else None,
+            higher_is_better=True
+        )
+        recommendations.append({
+            "Product": product,
+            "Category": category,
+            "Alert": "💡 Low Conversion",
+            "Type": "info",
+            "Metric": "Conv. Rate",
+            "This Week": f"{this_week['conversion_rate']:.2%}",
+            "Last Week": f"{lw['conversion_rate']:.2%}" if lw is not None else "—",
+            "Trend": f"{arrow} {trend_label}",
+            "Action": "Review pricing, add reviews, or improve bullet points.",
+        })
+
+    # --- Revenue declining ---
+    if lw is not None and this_week["revenue"] < lw["revenue"] * 0.85:
+        pct = (this_week["revenue"] - lw["revenue"]) / lw["revenue"] * 100
+        recommendations.append({
+            "Product": product,
+            "Category": category,
+            "Alert": "📉 Revenue Drop",
+            "Type": "warning",
+            "Metric": "Revenue",
+            "This Week": f"${this_week['revenue']:,.0f}",
+            "Last Week": f"${lw['revenue']:,.0f}",
+            "Trend": f"📉 {pct:.1f}%",
+            "Action": "Investigate stock levels, pricing changes, or ad budget drops.",
+        })
+
+    return recommendations
+
+
 def generate_recommendations(df):
     latest_date = df["date"].max()
-    recommendations = []
 
-    for product, df_product in df.groupby("name"):
-        category = df_product["category"].iloc[0]
-
-        this_week = _week_avg(df_product, latest_date, week_offset=0)
-        last_week = _week_avg(df_product, latest_date, week_offset=1)
-
-        if this_week is None:
-            continue
-
-        lw = last_week  # shorthand — may be None
-
-        # --- ACOS too high ---
-        if this_week["ACOS"] > 0.35:
-            arrow, trend_label = _trend_arrow(
-                this_week["ACOS"],
-                lw["ACOS"] if lw is not None else None,
-                higher_is_better=False
-            )
-            recommendations.append({
-                "Product": product,
-                "Category": category,
-                "Alert": "⚠️ High ACOS",
-                "Type": "warning",
-                "Metric": "ACOS",
-                "This Week": f"{this_week['ACOS']:.1%}",
-                "Last Week": f"{lw['ACOS']:.1%}" if lw is not None else "—",
-                "Trend": f"{arrow} {trend_label}",
-                "Action": "Reduce bids or pause low-converting keywords.",
-            })
-
-        # --- ROAS strong ---
-        if this_week["ROAS"] > 4:
-            arrow, trend_label = _trend_arrow(
-                this_week["ROAS"],
-                lw["ROAS"] if lw is not None else None,
-                higher_is_better=True
-            )
-            recommendations.append({
-                "Product": product,
-                "Category": category,
-                "Alert": "🚀 Strong ROAS",
-                "Type": "success",
-                "Metric": "ROAS",
-                "This Week": f"{this_week['ROAS']:.2f}x",
-                "Last Week": f"{lw['ROAS']:.2f}x" if lw is not None else "—",
-                "Trend": f"{arrow} {trend_label}",
-                "Action": "Scale ad budget to capture more demand.",
-            })
-
-        # --- CTR low ---
-        if this_week["CTR"] < 0.02:
-            arrow, trend_label = _trend_arrow(
-                this_week["CTR"],
-                lw["CTR"] if lw is not None else None,
-                higher_is_better=True
-            )
-            recommendations.append({
-                "Product": product,
-                "Category": category,
-                "Alert": "🖼️ Low CTR",
-                "Type": "warning",
-                "Metric": "CTR",
-                "This Week": f"{this_week['CTR']:.2%}",
-                "Last Week": f"{lw['CTR']:.2%}" if lw is not None else "—",
-                "Trend": f"{arrow} {trend_label}",
-                "Action": "A/B test main image or rewrite product title.",
-            })
-
-        # --- Conversion rate low ---
-        if this_week["conversion_rate"] < 0.08:
-            arrow, trend_label = _trend_arrow(
-                this_week["conversion_rate"],
-                lw["conversion_rate"] if lw is not None else None,
-                higher_is_better=True
-            )
-            recommendations.append({
-                "Product": product,
-                "Category": category,
-                "Alert": "💡 Low Conversion",
-                "Type": "info",
-                "Metric": "Conv. Rate",
-                "This Week": f"{this_week['conversion_rate']:.2%}",
-                "Last Week": f"{lw['conversion_rate']:.2%}" if lw is not None else "—",
-                "Trend": f"{arrow} {trend_label}",
-                "Action": "Review pricing, add reviews, or improve bullet points.",
-            })
-
-        # --- Revenue declining ---
-        if lw is not None and this_week["revenue"] < lw["revenue"] * 0.85:
-            pct = (this_week["revenue"] - lw["revenue"]) / lw["revenue"] * 100
-            recommendations.append({
-                "Product": product,
-                "Category": category,
-                "Alert": "📉 Revenue Drop",
-                "Type": "warning",
-                "Metric": "Revenue",
-                "This Week": f"${this_week['revenue']:,.0f}",
-                "Last Week": f"${lw['revenue']:,.0f}",
-                "Trend": f"📉 {pct:.1f}%",
-                "Action": "Investigate stock levels, pricing changes, or ad budget drops.",
-            })
+    # All arithmetic happens here in one groupby; the per-product step
+    # below only turns the averages into recommendation dicts.
+    weekly     = _weekly_averages(df, latest_date)
+    this_weeks = weekly.xs(0, axis=1, level=1).to_dict("index")
+    last_weeks = weekly.xs(1, axis=1, level=1).to_dict("index")
+    categories = df.groupby("name", observed=True, sort=False)["category"].first().to_dict()
+
+    jobs = (
+        delayed(_product_recommendations)(
+            product, categories[product], this_weeks[product], last_weeks[product]
+        )
+        for product in weekly.index
+        if not pd.isna(this_weeks[product]["revenue"])
+    )
+    # Products are independent, so large catalogs are spread over a thread
+    # pool; small ones run inline, where pool start-up would dominate.
+    n_jobs = -1 if len(weekly) >= PARALLEL_MIN_PRODUCTS else 1
+    per_product = Parallel(n_jobs=n_jobs, prefer="threads")(jobs)
+    recommendations = list(chain.from_iterable(per_product))
 
     # Sort: warnings first, then info, then success
     order = {"warning": 0, "info": 1, "success": 2}
@@ -176,5 +178,5 @@ def generate_recommendations(df):
 
 
 def get_recommendations():
-    df = load_data()
+    df = load_performance(days_back=HISTORY_DAYS)
     return generate_recommendations(df)
\ No newline at end of file
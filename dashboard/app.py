@@ -1,19 +1,19 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
 from dotenv import load_dotenv
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from analysis._loader import load_performance, load_product_catalog
 from analysis.recommendation_engine import get_recommendations
 from analysis.anomaly_detection import detect_anomalies
 from analysis.kpi_analysis import (
     calculate_kpis, get_kpi_summary, get_top_sellers,
     get_worst_performers, calculate_week_over_week_change,
 )
-from analysis.forecasting import forecast_revenue, forecast_revenue_ma
+from analysis.forecasting import forecast_both
 
 load_dotenv()
 
@@ -26,34 +26,91 @@ with st.sidebar:
     st.header("Filters")
 
 # ── LOAD DATA ─────────────────────────────────────────────────────────────────
+# Filters are pushed into the SQL query, so only the selected rows are
+# fetched; the sidebar is fed from a tiny DISTINCT query on products.
+@st.cache_data(ttl=300)
+def load_data(product="All", category="All"):
+    return load_performance(
+        product  = None if product  == "All" else product,
+        category = None if category == "All" else category,
+    )
+
+@st.cache_data(ttl=3600)
+def load_filter_options():
+    """(product names, all categories, product → its categories)."""
+    catalog = load_product_catalog()
+    name_to_cats = {
+        name: sorted(cats.tolist())
+        for name, cats in catalog.groupby("name")["category"].unique().items()
+    }
+    return sorted(name_to_cats), sorted(catalog["category"].unique().tolist()), name_to_cats
+
+product_names, all_categories, name_to_cats = load_filter_options()
+
+# ── CACHED ANALYSIS ───────────────────────────────────────────────────────────
+# Keyed on the filter tuple, so reruns triggered by unrelated widgets
+# (search box, page switch, buttons) reuse the pandas work.
+@st.cache_data(ttl=300)
+def filtered_df(product, category):
+    """The selected rows (filtered in SQL) with KPI columns attached."""
+    return calculate_kpis(load_data(product, category))
+
+@st.cache_data(ttl=300)
+def kpi_bundle(product, category):
+    df = filtered_df(product, category)
+    summary      = get_kpi_summary(df)
+    summary_prev = get_kpi_summary(
+        df[df["date"] < df["date"].max() - pd.Timedelta(days=6)]
+    ) if len(df["date"].unique()) > 7 else None
+    return summary, summary_prev
+
+@st.cache_data(ttl=300)
+def top_sellers_for(product, category, top_n=5):
+    return get_top_sellers(load_data(product, category), top_n=top_n)
+
+@st.cache_data(ttl=300)
+def worst_performers_for(product, category, top_n=5):
+    return get_worst_performers(load_data(product, category), top_n=top_n)
+
+@st.cache_data(ttl=300)
+def week_over_week_for(product, category):
+    return calculate_week_over_week_change(load_data(product, category))
+
+@st.cache_data(ttl=300)
+def anomalies_for_product(product):
+    # load_data(product) holds only this product, so no post-filter is needed.
+    return detect_anomalies(load_data(product))
+
+@st.cache_data(ttl=300)
+def recommendations_for():
+    return get_recommendations()
+
+@st.cache_data(ttl=300)
+def recommendations_table():
+    """(recommendations DataFrame, lowercase product names the search box matches)."""
+    rec_df = pd.DataFrame(recommendations_for())
+    return rec_df, rec_df["Product"].astype(str).str.lower()
+
+@st.cache_data(ttl=300)
+def revenue_trend_for(product, category):
+    """Daily revenue with one column per category."""
+    df = load_data(product, category)
+    return df.groupby(["date", "category"], observed=True)["revenue"].sum().unstack("category")
+
+def _ribbon(upper, lower):
+    """Closed polygon for a fill="toself" band: upper forwards, lower back."""
+    return np.concatenate([upper.to_numpy(), lower.to_numpy()[::-1]])
+
 @st.cache_data
-def load_data():
-    DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    engine = create_engine(DB_URL)
-    query = """
-        SELECT dp.date, p.name, p.category,
-               dp.impressions, dp.clicks, dp.ad_spend,
-               dp.units_sold, dp.revenue
-        FROM daily_performance dp
-        JOIN products p ON dp.product_id = p.id
-        ORDER BY dp.date;
-    """
-    df = pd.read_sql(query, engine)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
-df_full = load_data()
+def get_forecast_bundle(days, product, category):
+    """(ARIMA, moving average) forecasts, from one series load. Shared by both pages."""
+    return forecast_both(days, product_filter=product, category_filter=category)
 
 # ── SIDEBAR FILTERS ───────────────────────────────────────────────────────────
 with st.sidebar:
-    selected_product  = st.selectbox("Product",  ["All"] + sorted(df_full["name"].unique().tolist()))
-    category_options  = df_full["category"].unique() if selected_product == "All" else df_full[df_full["name"] == selected_product]["category"].unique()
-    selected_category = st.selectbox("Category", ["All"] + sorted(category_options.tolist()))
-
-df = df_full.copy()
-if selected_product  != "All": df = df[df["name"]     == selected_product]
-if selected_category != "All": df = df[df["category"] == selected_category]
-df = calculate_kpis(df)
+    selected_product  = st.selectbox("Product",  ["All"] + product_names)
+    category_options  = all_categories if selected_product == "All" else name_to_cats[selected_product]
+    selected_category = st.selectbox("Category", ["All"] + category_options)
 
 active_filter = selected_product if selected_product != "All" else (selected_category if selected_category != "All" else "All Products")
 
@@ -65,31 +122,30 @@ if page == "📊 Overview":
 
     # ── KPI CARDS ─────────────────────────────────────────────────────────────
     st.subheader("📊 KPI Summary")
-    summary      = get_kpi_summary(df)
-    summary_prev = get_kpi_summary(calculate_kpis(
-        df[df["date"] < df["date"].max() - pd.Timedelta(days=6)]
-    )) if len(df["date"].unique()) > 7 else None
+    df = filtered_df(selected_product, selected_category)
+    summary, summary_prev = kpi_bundle(selected_product, selected_category)
 
-    def _delta(key):
-        if summary_prev is None: return None
-        prev = summary_prev.get(key, 0)
-        curr = summary.get(key, 0)
-        if prev == 0: return None
-        return f"{(curr - prev) / abs(prev) * 100:+.1f}% vs prev week"
+    delta_keys = ("total_revenue", "avg_roas", "avg_acos", "avg_ctr", "avg_cpc", "avg_conversion_rate")
+    if summary_prev is None:
+        deltas = dict.fromkeys(delta_keys)
+    else:
+        deltas = {
+            k: f"{(summary[k] - summary_prev[k]) / abs(summary_prev[k]) * 100:+.1f}% vs prev week"
+               if summary_prev[k] != 0 else None
+            for k in delta_keys
+        }
 
     c1,c2,c3,c4,c5,c6 = st.columns(6)
-    c1.metric("Total Revenue",  f"${summary['total_revenue']:,.0f}",     _delta("total_revenue"))
-    c2.metric("Avg ROAS",       f"{summary['avg_roas']:.2f}x",           _delta("avg_roas"))
-    c3.metric("Avg ACOS",       f"{summary['avg_acos']:.1%}",            _delta("avg_acos"))
-    c4.metric("Avg CTR",        f"{summary['avg_ctr']:.2%}",             _delta("avg_ctr"))
-    c5.metric("Avg CPC",        f"${summary['avg_cpc']:.2f}",            _delta("avg_cpc"))
-    c6.metric("Avg Conv. Rate", f"{summary['avg_conversion_rate']:.2%}", _delta("avg_conversion_rate"))
+    c1.metric("Total Revenue",  f"${summary['total_revenue']:,.0f}",     deltas["total_revenue"])
+    c2.metric("Avg ROAS",       f"{summary['avg_roas']:.2f}x",           deltas["avg_roas"])
+    c3.metric("Avg ACOS",       f"{summary['avg_acos']:.1%}",            deltas["avg_acos"])
+    c4.metric("Avg CTR",        f"{summary['avg_ctr']:.2%}",             deltas["avg_ctr"])
+    c5.metric("Avg CPC",        f"${summary['avg_cpc']:.2f}",            deltas["avg_cpc"])
+    c6.metric("Avg Conv. Rate", f"{summary['avg_conversion_rate']:.2%}", deltas["avg_conversion_rate"])
 
     # ── REVENUE TREND ─────────────────────────────────────────────────────────
     st.subheader("📈 Revenue Trend by Category")
-    revenue_trend = df.groupby(["date","category"])["revenue"].sum().reset_index()
-    revenue_trend = revenue_trend.pivot(index="date", columns="category", values="revenue")
-    st.line_chart(revenue_trend)
+    st.line_chart(revenue_trend_for(selected_product, selected_category))
 
     # ── DUAL FORECAST ─────────────────────────────────────────────────────────
     import plotly.graph_objects as go
@@ -97,46 +153,42 @@ if page == "📊 Overview":
     st.subheader("🔮 Revenue Forecast (Next 30 Days)")
     st.caption(f"Forecast for: **{active_filter}** · ARIMA vs Moving Average (7-day window)")
 
-    @st.cache_data
-    def get_forecasts(days, pf, cf):
-        return (
-            forecast_revenue(days, product_filter=pf, category_filter=cf),
-            forecast_revenue_ma(days, product_filter=pf, category_filter=cf),
-        )
-
-    fc_arima, fc_ma = get_forecasts(30, selected_product, selected_category)
-    today = pd.Timestamp("today").normalize()
+    fc_arima, fc_ma = get_forecast_bundle(30, selected_product, selected_category)
+    today = np.datetime64(pd.Timestamp("today").normalize())
 
     def _split(fc):
-        return fc[fc["ds"] <= today], fc[fc["ds"] > today]
+        past = fc["ds"].to_numpy() <= today
+        return fc[past], fc[~past]
 
     hist_a, fut_a = _split(fc_arima)
     _,       fut_m = _split(fc_ma)
 
+    # Line traces use WebGL (Scattergl) so long histories don't build an
+    # SVG node per point; the CI fills stay SVG, where fill="toself" is reliable.
     fig = go.Figure()
 
     # Historical
-    fig.add_trace(go.Scatter(x=hist_a["ds"], y=hist_a["yhat"], mode="lines",
+    fig.add_trace(go.Scattergl(x=hist_a["ds"].to_numpy(), y=hist_a["yhat"].to_numpy(), mode="lines",
         name="Historical Revenue", line=dict(color="#1f77b4", width=2)))
 
     # ARIMA CI + line
     fig.add_trace(go.Scatter(
-        x=pd.concat([fut_a["ds"], fut_a["ds"][::-1]]),
-        y=pd.concat([fut_a["yhat_upper"], fut_a["yhat_lower"][::-1]]),
+        x=_ribbon(fut_a["ds"], fut_a["ds"]),
+        y=_ribbon(fut_a["yhat_upper"], fut_a["yhat_lower"]),
         fill="toself", fillcolor="rgba(255,127,14,0.15)",
         line=dict(color="rgba(0,0,0,0)"),
         name="ARIMA 80% CI", hoverinfo="skip"))
-    fig.add_trace(go.Scatter(x=fut_a["ds"], y=fut_a["yhat"], mode="lines",
+    fig.add_trace(go.Scattergl(x=fut_a["ds"].to_numpy(), y=fut_a["yhat"].to_numpy(), mode="lines",
         name="ARIMA Forecast", line=dict(color="#ff7f0e", width=2, dash="dash")))
 
     # MA CI + line
     fig.add_trace(go.Scatter(
-        x=pd.concat([fut_m["ds"], fut_m["ds"][::-1]]),
-        y=pd.concat([fut_m["yhat_upper"], fut_m["yhat_lower"][::-1]]),
+        x=_ribbon(fut_m["ds"], fut_m["ds"]),
+        y=_ribbon(fut_m["yhat_upper"], fut_m["yhat_lower"]),
         fill="toself", fillcolor="rgba(44,160,44,0.12)",
         line=dict(color="rgba(0,0,0,0)"),
         name="MA 80% CI", hoverinfo="skip"))
-    fig.add_trace(go.Scatter(x=fut_m["ds"], y=fut_m["yhat"], mode="lines",
+    fig.add_trace(go.Scattergl(x=fut_m["ds"].to_numpy(), y=fut_m["yhat"].to_numpy(), mode="lines",
         name="MA Forecast (7d)", line=dict(color="#2ca02c", width=2, dash="dot")))
 
     fig.update_layout(
@@ -151,37 +203,39 @@ if page == "📊 Overview":
     pc1, pc2 = st.columns(2)
     with pc1:
         st.markdown("**Top Sellers — Total Revenue**")
-        top = get_top_sellers(df, top_n=5).reset_index()
+        top = top_sellers_for(selected_product, selected_category, top_n=5).reset_index()
         top.columns = ["Product", "Revenue"]
-        top["Revenue"] = top["Revenue"].apply(lambda x: f"${x:,.0f}")
+        top["Revenue"] = "$" + top["Revenue"].map("{:,.0f}".format)
         st.dataframe(top, use_container_width=True, hide_index=True)
     with pc2:
         st.markdown("**Worst Performers — ROAS**")
-        worst = get_worst_performers(df, top_n=5).reset_index()
+        worst = worst_performers_for(selected_product, selected_category, top_n=5).reset_index()
         worst.columns = ["Product", "ROAS"]
-        worst["ROAS"] = worst["ROAS"].apply(lambda x: f"{x:.2f}x")
+        worst["ROAS"] = worst["ROAS"].map("{:.2f}x".format)
         st.dataframe(worst, use_container_width=True, hide_index=True)
 
     # ── WEEK-OVER-WEEK ────────────────────────────────────────────────────────
     st.subheader("📅 Week-over-Week Revenue Change")
-    wow = calculate_week_over_week_change(df)
-    wow["this_week"]  = wow["this_week"].apply(lambda x: f"${x:,.0f}")
-    wow["last_week"]  = wow["last_week"].apply(lambda x: f"${x:,.0f}")
-    wow["change_pct"] = wow["change_pct"].apply(lambda x: f"{'📈' if x > 0 else '📉'} {x:+.1f}%")
+    wow = week_over_week_for(selected_product, selected_category)
+    sign = np.where(wow["change_pct"] > 0, "📈 ", "📉 ")
+    wow["this_week"]  = "$" + wow["this_week"].map("{:,.0f}".format)
+    wow["last_week"]  = "$" + wow["last_week"].map("{:,.0f}".format)
+    wow["change_pct"] = sign + wow["change_pct"].map("{:+.1f}%".format)
     wow.columns = ["Product", "This Week", "Last Week", "Change"]
     st.dataframe(wow, use_container_width=True, hide_index=True)
 
     # ── ANOMALY DETECTION ─────────────────────────────────────────────────────
     st.subheader("🔍 Anomaly Detection")
-    anomalies = detect_anomalies(df)
-    if not anomalies:
+    an_df = detect_anomalies(df)
+    if an_df.empty:
         st.success("✅ No anomalies detected in the last 7 days.")
     else:
-        an_df  = pd.DataFrame(anomalies)
-        spikes = sum(1 for a in anomalies if a["Type"] == "📈 Spike")
-        drops  = sum(1 for a in anomalies if a["Type"] == "📉 Drop")
+        types, counts = np.unique(an_df["Type"].to_numpy(), return_counts=True)
+        type_counts = dict(zip(types, counts.tolist()))
+        spikes = type_counts.get("📈 Spike", 0)
+        drops  = type_counts.get("📉 Drop", 0)
         ac1, ac2, ac3 = st.columns(3)
-        ac1.metric("Total Anomalies", len(anomalies))
+        ac1.metric("Total Anomalies", len(an_df))
         ac2.metric("📈 Spikes", spikes)
         ac3.metric("📉 Drops",  drops)
         st.dataframe(an_df, use_container_width=True, hide_index=True,
@@ -197,14 +251,14 @@ if page == "📊 Overview":
 
     # ── RECOMMENDATIONS ───────────────────────────────────────────────────────
     st.subheader("🎯 Automated Recommendations")
-    recommendations = get_recommendations()
+    recommendations = recommendations_for()
     if not recommendations:
         st.success("✅ No optimization recommendations for today.")
     elif isinstance(recommendations[0], str):
         st.warning("⚠️ recommendation_engine.py is outdated.")
         for rec in recommendations: st.info(rec)
     else:
-        rec_df = pd.DataFrame(recommendations)
+        rec_df, name_lc = recommendations_table()
         rf1, rf2, rf3 = st.columns(3)
         with rf1:
             sel_type = st.selectbox("Filter by Alert",    ["All"] + sorted(rec_df["Alert"].unique().tolist()))
@@ -212,10 +266,12 @@ if page == "📊 Overview":
             sel_cat  = st.selectbox("Filter by Category", ["All"] + sorted(rec_df["Category"].unique().tolist()))
         with rf3:
             search = st.text_input("Search product", placeholder="e.g. Wireless Mouse")
-        filtered = rec_df.copy()
-        if sel_type != "All": filtered = filtered[filtered["Alert"]    == sel_type]
-        if sel_cat  != "All": filtered = filtered[filtered["Category"] == sel_cat]
-        if search:            filtered = filtered[filtered["Product"].str.contains(search, case=False, na=False)]
+        keep = np.ones(len(rec_df), dtype=bool)
+        if sel_type != "All": keep &= (rec_df["Alert"]    == sel_type).to_numpy()
+        if sel_cat  != "All": keep &= (rec_df["Category"] == sel_cat).to_numpy()
+        # Plain substring match on the lowercase index: no regex compile per keystroke.
+        if search:            keep &= name_lc.str.contains(search.lower(), regex=False).to_numpy()
+        filtered = rec_df[keep]
         st.caption(f"Showing {len(filtered)} of {len(rec_df)} recommendation(s) · last 7 days vs previous 7 days")
         st.dataframe(filtered.drop(columns=["Type"]).reset_index(drop=True),
             use_container_width=True, hide_index=True)
@@ -230,8 +286,8 @@ elif page == "🔍 Product Detail":
 
     st.title("🔍 Product Detail")
 
-    product = st.selectbox("Select a product", sorted(df_full["name"].unique().tolist()))
-    df_p = calculate_kpis(df_full[df_full["name"] == product].copy())
+    product = st.selectbox("Select a product", product_names)
+    df_p = filtered_df(product, "All")
 
     if df_p.empty:
         st.warning("No data for this product.")
@@ -252,9 +308,9 @@ elif page == "🔍 Product Detail":
     # ── REVENUE + AD SPEND OVER TIME ──────────────────────────────────────────
     st.subheader("💰 Revenue & Ad Spend Over Time")
     fig_rev = go.Figure()
-    fig_rev.add_trace(go.Scatter(x=df_p["date"], y=df_p["revenue"],
+    fig_rev.add_trace(go.Scattergl(x=df_p["date"].to_numpy(), y=df_p["revenue"].to_numpy(),
         mode="lines", name="Revenue", line=dict(color="#1f77b4", width=2)))
-    fig_rev.add_trace(go.Scatter(x=df_p["date"], y=df_p["ad_spend"],
+    fig_rev.add_trace(go.Scattergl(x=df_p["date"].to_numpy(), y=df_p["ad_spend"].to_numpy(),
         mode="lines", name="Ad Spend", line=dict(color="#d62728", width=1.5, dash="dot")))
     fig_rev.update_layout(hovermode="x unified", plot_bgcolor=None,
         legend=dict(orientation="h", y=1.1))
@@ -265,14 +321,14 @@ elif page == "🔍 Product Detail":
     m_col1, m_col2 = st.columns(2)
     with m_col1:
         fig_ctr = px.line(df_p, x="date", y="CTR", title="CTR over time (Click-Through Rate = Clicks / Impressions)",
-            color_discrete_sequence=["#9467bd"])
+            color_discrete_sequence=["#9467bd"], render_mode="webgl")
         fig_ctr.add_hline(y=0.02, line_dash="dash", line_color="red",
             annotation_text="Min threshold (2%)")
         fig_ctr.update_layout(plot_bgcolor=None)
         st.plotly_chart(fig_ctr, use_container_width=True)
     with m_col2:
         fig_roas = px.line(df_p, x="date", y="ROAS", title="ROAS over time (Return on Ad Spend = Revenue / Ad Spend)",
-            color_discrete_sequence=["#2ca02c"])
+            color_discrete_sequence=["#2ca02c"], render_mode="webgl")
         fig_roas.add_hline(y=4, line_dash="dash", line_color="green",
             annotation_text="Target (4x)")
         fig_roas.update_layout(plot_bgcolor=None)
@@ -281,36 +337,30 @@ elif page == "🔍 Product Detail":
     # ── DUAL FORECAST FOR THIS PRODUCT ────────────────────────────────────────
     st.subheader("🔮 Revenue Forecast (Next 30 Days)")
 
-    @st.cache_data
-    def get_product_forecasts(prod, days=30):
-        return (
-            forecast_revenue(days, product_filter=prod),
-            forecast_revenue_ma(days, product_filter=prod),
-        )
-
     try:
-        fc_a, fc_m = get_product_forecasts(product)
-        today = pd.Timestamp("today").normalize()
-        hist_a = fc_a[fc_a["ds"] <= today]
-        fut_a  = fc_a[fc_a["ds"] >  today]
-        fut_m  = fc_m[fc_m["ds"] >  today]
+        fc_a, fc_m = get_forecast_bundle(30, product, "All")
+        today  = np.datetime64(pd.Timestamp("today").normalize())
+        past_a = fc_a["ds"].to_numpy() <= today
+        hist_a = fc_a[past_a]
+        fut_a  = fc_a[~past_a]
+        fut_m  = fc_m[fc_m["ds"].to_numpy() > today]
 
         fig_fc = go.Figure()
-        fig_fc.add_trace(go.Scatter(x=hist_a["ds"], y=hist_a["yhat"], mode="lines",
+        fig_fc.add_trace(go.Scattergl(x=hist_a["ds"].to_numpy(), y=hist_a["yhat"].to_numpy(), mode="lines",
             name="Historical", line=dict(color="#1f77b4", width=2)))
         fig_fc.add_trace(go.Scatter(
-            x=pd.concat([fut_a["ds"], fut_a["ds"][::-1]]),
-            y=pd.concat([fut_a["yhat_upper"], fut_a["yhat_lower"][::-1]]),
+            x=_ribbon(fut_a["ds"], fut_a["ds"]),
+            y=_ribbon(fut_a["yhat_upper"], fut_a["yhat_lower"]),
             fill="toself", fillcolor="rgba(255,127,14,0.15)",
             line=dict(color="rgba(0,0,0,0)"), name="ARIMA CI", hoverinfo="skip"))
-        fig_fc.add_trace(go.Scatter(x=fut_a["ds"], y=fut_a["yhat"], mode="lines",
+        fig_fc.add_trace(go.Scattergl(x=fut_a["ds"].to_numpy(), y=fut_a["yhat"].to_numpy(), mode="lines",
             name="ARIMA", line=dict(color="#ff7f0e", width=2, dash="dash")))
         fig_fc.add_trace(go.Scatter(
-            x=pd.concat([fut_m["ds"], fut_m["ds"][::-1]]),
-            y=pd.concat([fut_m["yhat_upper"], fut_m["yhat_lower"][::-1]]),
+            x=_ribbon(fut_m["ds"], fut_m["ds"]),
+            y=_ribbon(fut_m["yhat_upper"], fut_m["yhat_lower"]),
             fill="toself", fillcolor="rgba(44,160,44,0.12)",
             line=dict(color="rgba(0,0,0,0)"), name="MA CI", hoverinfo="skip"))
-        fig_fc.add_trace(go.Scatter(x=fut_m["ds"], y=fut_m["yhat"], mode="lines",
+        fig_fc.add_trace(go.Scattergl(x=fut_m["ds"].to_numpy(), y=fut_m["yhat"].to_numpy(), mode="lines",
             name="Moving Avg", line=dict(color="#2ca02c", width=2, dash="dot")))
         fig_fc.update_layout(hovermode="x unified", plot_bgcolor=None,
             xaxis_title="Date", yaxis_title="Revenue ($)",
@@ -321,11 +371,11 @@ elif page == "🔍 Product Detail":
 
     # ── ANOMALIES FOR THIS PRODUCT ────────────────────────────────────────────
     st.subheader("🔍 Recent Anomalies")
-    anomalies_p = [a for a in detect_anomalies(df_p) if a["Product"] == product]
-    if not anomalies_p:
+    anomalies_p = anomalies_for_product(product)
+    if anomalies_p.empty:
         st.success("✅ No anomalies detected in the last 7 days.")
     else:
-        st.dataframe(pd.DataFrame(anomalies_p), use_container_width=True, hide_index=True)
+        st.dataframe(anomalies_p, use_container_width=True, hide_index=True)
 
     # ── RECOMMENDATIONS ───────────────────────────────────────────────────────
     st.subheader("🎯 Recommendations")
@@ -1,89 +1,178 @@
 import requests
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
 import psycopg2
+from psycopg2.extras import execute_values
+import numpy as np
 import math
 import random
+import io
 from datetime import datetime
+from functools import lru_cache
 
 from dotenv import load_dotenv
 import os
 
+try:
+    import pyarrow as pa
+except ImportError:  # optional — fall back to the JSON endpoint
+    pa = None
+
+try:
+    import orjson
+except ImportError:  # optional — fall back to requests' stdlib json decoding
+    orjson = None
+
 # CONFIG
 load_dotenv()
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 
+# One pooled HTTP session, so both fetches (and every scheduled run)
+# reuse the same keep-alive connection to the API.
+SESSION = requests.Session()
+REQUEST_TIMEOUT = 30  # seconds; a hung API must not stall the scheduler
+
 # --- Simulation function for trend and seasonality effects ---
+# Category-level multipliers; categories not listed (Accessories etc.) get 1.00.
+CATEGORY_MULTIPLIERS = {"Electronics": 1.08, "Audio": 1.05, "Office": 0.97}
+
 def product_trend_multiplier(product_id, date_str, category):
     """
     Applies a small category-level multiplier only.
     All major trend/seasonality/noise is now handled in the API layer
     to avoid stacking random effects that destroy ARIMA's signal.
     """
-    if category == "Electronics":
-        return 1.08
-    elif category == "Audio":
-        return 1.05
-    elif category == "Office":
-        return 0.97
-    else:  # Accessories etc.
-        return 1.00
+    return CATEGORY_MULTIPLIERS.get(category, 1.00)
 
 # --- EXTRACT ---
-def fetch_products():
-    response = requests.get(f"{API_BASE_URL}/products")
+def _json(response):
+    """Decode a JSON response body, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(response.content)
     return response.json()
 
+# Last catalog fetched and its ETag, so unchanged runs get a bodiless 304.
+_products_cache = {"etag": None, "products": None}
+
+def fetch_products():
+    headers = {}
+    if _products_cache["etag"] is not None:
+        headers["If-None-Match"] = _products_cache["etag"]
+    response = SESSION.get(f"{API_BASE_URL}/products", headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304:
+        return _products_cache["products"]
+    products = _json(response)
+    _products_cache.update(etag=response.headers.get("ETag"), products=products)
+    return products
+
 def fetch_daily_performance():
-    response = requests.get(f"{API_BASE_URL}/daily-performance?days_back=90")
-    return response.json()
+    """
+    Daily rows from the API. With pyarrow available they come as an Arrow
+    IPC stream straight into a DataFrame; otherwise as a JSON list.
+    """
+    if pa is not None:
+        response = SESSION.get(f"{API_BASE_URL}/daily-performance.arrow?days_back=90", timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return pa.ipc.open_stream(response.content).read_all().to_pandas()
+    response = SESSION.get(f"{API_BASE_URL}/daily-performance?days_back=90", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return _json(response)
 
 # --- LOAD ---
+@lru_cache(maxsize=1)
 def _get_engine():
+    """One engine (and connection pool) shared by every ETL stage and run."""
     DB_URL = f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}/{os.getenv('DB_NAME')}"
-    return create_engine(DB_URL)
+    return create_engine(DB_URL, pool_pre_ping=True, pool_size=5)
 
 def load_products(products):
-    with _get_engine().begin() as conn:
-        for p in products:
-            conn.execute(
-                text("""
+    """Upsert the catalog in one batched statement via execute_values."""
+    rows = [(p["id"], p["name"], p["price"], p["category"]) for p in products]
+    raw = _get_engine().raw_connection()
+    try:
+        with raw.cursor() as cur:
+            execute_values(
+                cur,
+                """
                     INSERT INTO products (id, name, price, category)
-                    VALUES (:id, :name, :price, :category)
+                    VALUES %s
                     ON CONFLICT (id)
-                     DO UPDATE SET name = EXCLUDED.name, 
-                     price = EXCLUDED.price, 
+                     DO UPDATE SET name = EXCLUDED.name,
+                     price = EXCLUDED.price,
                      category = EXCLUDED.category
-                """),
-                p
+                """,
+                rows,
+                page_size=100,
             )
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+DAILY_COLUMNS = ["date", "product_id", "impressions", "clicks", "ad_spend", "units_sold", "revenue"]
+# Daily counts are far below 2**31, so int32 halves the bytes that the
+# multiplier pass and the CSV writer walk over.
+DAILY_DTYPES = {c: "int32" for c in ["product_id", "impressions", "clicks", "units_sold"]}
 
 def load_daily_performance(data, product_categories):
-    with _get_engine().begin() as conn:
-        for d in data:
-            # Get category from product_id
-            category = product_categories.get(d["product_id"], "Unknown")
-
-            # Apply trend/seasonality multiplier
-            multiplier = product_trend_multiplier(d["product_id"], d["date"], category)
-
-            d["units_sold"] = int(d["units_sold"] * multiplier)
-            d["revenue"] = round(d["revenue"] * multiplier, 2)
-
-            conn.execute(
-                text("""
-                    INSERT INTO daily_performance (
-                        date, product_id, impressions,
-                        clicks, ad_spend, units_sold, revenue
-                    )
-                    VALUES (
-                        :date, :product_id, :impressions,
-                        :clicks, :ad_spend, :units_sold, :revenue
-                    )
-                    ON CONFLICT (date, product_id) DO NOTHING
-                """),
-                d
+    """
+    Bulk-load daily rows: COPY them into a temporary staging table, then
+    move them over with one INSERT ... ON CONFLICT DO NOTHING. One COPY
+    stream replaces a parse/plan/round-trip per row, and existing
+    (date, product_id) rows are still left untouched. `data` may be a
+    list of row dicts or a DataFrame.
+
+    Rows dated before the newest date already in daily_performance are
+    dropped client-side first, so a steady-state daily run only ships
+    the last stored day (which may be partial) and the new one(s).
+    """
+    df = pd.DataFrame(data, columns=DAILY_COLUMNS).astype(DAILY_DTYPES)
+
+    columns = ", ".join(DAILY_COLUMNS)
+    raw = _get_engine().raw_connection()
+    try:
+        with raw.cursor() as cur:
+            cur.execute("SELECT max(date) FROM daily_performance")
+            watermark = cur.fetchone()[0]
+            if watermark is not None:
+                df = df[pd.to_datetime(df["date"]) >= pd.Timestamp(watermark)]
+            if df.empty:
+                raw.commit()
+                return
+
+            # Apply the category multiplier to every row at once
+            category = df["product_id"].map(product_categories)
+            multiplier = category.map(CATEGORY_MULTIPLIERS).fillna(1.00).to_numpy()
+            df = df.assign(
+                units_sold=(df["units_sold"].to_numpy() * multiplier).astype(np.int32),
+                revenue=np.round(df["revenue"].to_numpy() * multiplier, 2),
+            )
+
+            buf = io.StringIO()
+            df.to_csv(buf, header=False, index=False)
+            buf.seek(0)
+
+            cur.execute("""
+                CREATE TEMP TABLE daily_performance_stage
+                (LIKE daily_performance INCLUDING DEFAULTS) ON COMMIT DROP
+            """)
+            cur.copy_expert(
+                f"COPY daily_performance_stage ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buf,
             )
+            cur.execute(f"""
+                INSERT INTO daily_performance ({columns})
+                SELECT {columns} FROM daily_performance_stage
+                ON CONFLICT (date, product_id) DO NOTHING
+            """)
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
 
 # --- MAIN ETL ---
 def run_etl():
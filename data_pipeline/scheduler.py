@@ -38,6 +38,11 @@ schedule.every().day.at("00:00").do(run_etl_job)
 
 logger.info("Scheduler running — ETL will execute daily at 00:00. Press Ctrl+C to stop.")
 
+# Sleep until the next job is due instead of waking every minute to poll.
 while True:
-    schedule.run_pending()
-    time.sleep(60)
\ No newline at end of file
+    idle = schedule.idle_seconds()
+    if idle is None:  # no jobs left to wait for
+        break
+    if idle > 0:
+        time.sleep(idle)
+    schedule.run_pending()
\ No newline at end of file
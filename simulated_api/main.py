@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Response
+from fastapi.responses import ORJSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from datetime import date, timedelta
-import random
+import numpy as np
+import pyarrow as pa
+import orjson
+import hashlib
 
 
-app = FastAPI(title = "Simulated Ads API")
+app = FastAPI(title = "Simulated Ads API", default_response_class=ORJSONResponse)
+# Row-per-dict JSON repeats every key; gzip cuts it ~10x. requests decodes it transparently.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 #Simulated product catalog
 
@@ -25,7 +32,6 @@ PRODUCTS = [
     {"id": 15, "name": "Tablet 10 inch", "price": 299.99, "category": "Electronics"},
 ]
 
-import math
 
 # Each product has a personality: base demand, price sensitivity, and growth stage
 PRODUCT_PROFILES = {
@@ -46,69 +52,114 @@ PRODUCT_PROFILES = {
     15: {"base": 70,   "growth": 0.0028, "volatility": 0.13},  # Tablet               - fast growth, high ticket
 }
 
-def generate_daily_metrics(product, target_date):
-    from datetime import date as date_type
-    profile = PRODUCT_PROFILES[product["id"]]
+# Per-product parameters as arrays aligned with PRODUCTS, so a whole
+# (date × product) grid of metrics is generated with NumPy broadcasting.
+PRODUCT_IDS = np.array([p["id"] for p in PRODUCTS], dtype=np.int32)
+PRICES      = np.array([p["price"] for p in PRODUCTS])
+BASE        = np.array([PRODUCT_PROFILES[i]["base"] for i in PRODUCT_IDS])
+GROWTH      = np.array([PRODUCT_PROFILES[i]["growth"] for i in PRODUCT_IDS])
+VOLATILITY  = np.array([PRODUCT_PROFILES[i]["volatility"] for i in PRODUCT_IDS])
+BASE_CTR    = 0.025 + (PRODUCT_IDS % 5) * 0.004   # 0.025 to 0.041 depending on product
+BASE_CR     = 0.10 + (PRODUCT_IDS % 4) * 0.02     # 0.10 to 0.16
+
+# Weekly seasonality by weekday (Mon..Sun): weekends +25%, Monday slow
+WEEKLY_FACTORS = np.array([0.88, 0.95, 1.00, 1.02, 1.05, 1.25, 1.20])
+# Monthly seasonality by day of month (index 1..31): mid-month dip, end-of-month boost
+MONTHLY_FACTORS = 1 + 0.10 * np.sin((np.arange(32) / 31) * 2 * np.pi - np.pi / 2)
+TREND_START = date(2025, 1, 1)
+
+_rng = np.random.default_rng()
+
+
+def generate_daily_columns(target_dates):
+    """
+    Metrics for every product on every date in `target_dates`, as a dict
+    of flat column arrays ordered by date, then product. Counts are int32;
+    money stays float64 so it serializes as exact two-decimal values.
+    """
+    n_dates, n_products = len(target_dates), len(PRODUCTS)
+    shape = (n_dates, n_products)
 
     # --- Trend: slow linear growth over time ---
-    days_since_start = (target_date - date_type(2025, 1, 1)).days
-    trend = 1 + profile["growth"] * days_since_start
+    days_since_start = np.array([(d - TREND_START).days for d in target_dates])
+    trend = 1 + GROWTH * days_since_start[:, None]
 
-    # --- Weekly seasonality: weekends +25%, Monday slow ---
-    weekday = target_date.weekday()
-    weekly = {0: 0.88, 1: 0.95, 2: 1.00, 3: 1.02, 4: 1.05, 5: 1.25, 6: 1.20}.get(weekday, 1.0)
-
-    # --- Monthly seasonality: mid-month dip, end-of-month boost ---
-    monthly = 1 + 0.10 * math.sin((target_date.day / 31) * 2 * math.pi - math.pi / 2)
+    # --- Weekly and monthly seasonality: table lookups, shared by all products ---
+    weekly  = WEEKLY_FACTORS[[d.weekday() for d in target_dates]][:, None]
+    monthly = MONTHLY_FACTORS[[d.day for d in target_dates]][:, None]
 
     # --- Controlled noise: gaussian, tight around 1.0 ---
-    noise = max(0.80, min(1.20, random.gauss(1.0, profile["volatility"])))
+    noise = np.clip(_rng.normal(1.0, VOLATILITY, shape), 0.80, 1.20)
 
     # --- Rare campaign spike (3% chance, max +50%) ---
-    spike = random.uniform(1.25, 1.50) if random.random() < 0.03 else 1.0
+    spike = np.where(_rng.random(shape) < 0.03, _rng.uniform(1.25, 1.50, shape), 1.0)
 
     # --- Compose multiplier ---
     multiplier = trend * weekly * monthly * noise * spike
 
     # --- Impressions ---
-    base_impressions = int(profile["base"] * 20 * multiplier)
-    impressions = max(500, base_impressions)
+    impressions = np.maximum(500, (BASE * 20 * multiplier).astype(np.int32))
 
     # --- CTR: stable per product with small daily variation ---
-    base_ctr = 0.025 + (product["id"] % 5) * 0.004  # 0.025 to 0.041 depending on product
-    ctr = max(0.010, min(0.08, random.gauss(base_ctr, 0.003)))
-    clicks = int(impressions * ctr)
+    ctr = np.clip(_rng.normal(BASE_CTR, 0.003, shape), 0.010, 0.08)
+    clicks = (impressions * ctr).astype(np.int32)
 
     # --- Conversion rate: stable, slight noise ---
-    base_cr = 0.10 + (product["id"] % 4) * 0.02   # 0.10 to 0.16
-    conversion_rate = max(0.05, min(0.30, random.gauss(base_cr, 0.015)))
-    units_sold = max(0, int(clicks * conversion_rate))
+    conversion_rate = np.clip(_rng.normal(BASE_CR, 0.015, shape), 0.05, 0.30)
+    units_sold = np.maximum(0, (clicks * conversion_rate).astype(np.int32))
 
-    revenue = round(units_sold * product["price"], 2)
-    ad_spend = round(clicks * random.gauss(0.55, 0.05), 2)
+    revenue = np.round(units_sold * PRICES, 2)
+    ad_spend = np.maximum(0, np.round(clicks * _rng.normal(0.55, 0.05, shape), 2))
 
     return {
-        "product_id": product["id"],
-        "date": str(target_date),
-        "impressions": impressions,
-        "clicks": clicks,
-        "ad_spend": max(0, ad_spend),
-        "units_sold": units_sold,
-        "revenue": revenue,
+        "product_id":  np.tile(PRODUCT_IDS, n_dates),
+        "date":        np.repeat([str(d) for d in target_dates], n_products),
+        "impressions": impressions.ravel(),
+        "clicks":      clicks.ravel(),
+        "ad_spend":    ad_spend.ravel(),
+        "units_sold":  units_sold.ravel(),
+        "revenue":     revenue.ravel(),
     }
 
+
+def generate_daily_metrics(target_dates):
+    """Same metrics as generate_daily_columns(), as a list of row dicts."""
+    columns = generate_daily_columns(target_dates)
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[n].tolist() for n in names))]
+
+
+def _target_dates(days_back):
+    today = date.today()
+    return [today - timedelta(days=i) for i in range(days_back + 1)]
+
+# The catalog is constant, so its body and ETag are built once at import.
+_PRODUCTS_JSON = orjson.dumps(PRODUCTS)
+_PRODUCTS_ETAG = f'"{hashlib.md5(_PRODUCTS_JSON).hexdigest()}"'
+_PRODUCTS_HEADERS = {"ETag": _PRODUCTS_ETAG, "Cache-Control": "public, max-age=3600"}
+
 @app.get("/products")
-def get_products():
-    return PRODUCTS
+def get_products(if_none_match: str | None = Header(default=None)):
+    if if_none_match == _PRODUCTS_ETAG:
+        return Response(status_code=304, headers=_PRODUCTS_HEADERS)
+    return Response(_PRODUCTS_JSON, media_type="application/json", headers=_PRODUCTS_HEADERS)
 
 @app.get("/daily-performance")
 def get_daily_performance(days_back: int = 0):
-    data = []
-    for i in range(days_back + 1):
-        target_date = date.today() - timedelta(days=i)
-
-        for product in PRODUCTS:
-            metrics = generate_daily_metrics(product, target_date)
-            metrics["date"] = str(target_date)
-            data.append(metrics)
-    return data
\ No newline at end of file
+    # Returned as a response directly: the rows are already plain Python
+    # values, so FastAPI's jsonable_encoder walk over them is pure overhead.
+    return ORJSONResponse(generate_daily_metrics(_target_dates(days_back)))
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+@app.get("/daily-performance.arrow")
+def get_daily_performance_arrow(days_back: int = 0):
+    """
+    Same data as /daily-performance as an Arrow IPC stream: the columns
+    go out as typed buffers, with no per-row JSON encode or decode.
+    """
+    table = pa.table(generate_daily_columns(_target_dates(days_back)))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
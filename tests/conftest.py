@@ -0,0 +1,97 @@
+"""
+Shared pytest setup: puts the repo root on sys.path, provides a per-run
+forecast model cache, and provides the synthetic multi-product frames,
+built once per test session.
+
+Frame fixtures, here and in the test modules, are shared between tests
+and must be treated as read-only; take a .copy() before assigning to a
+column.
+"""
+import pandas as pd
+import numpy as np
+import pytest
+from datetime import date
+from joblib import Memory
+
+import sys, os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analysis.kpi_analysis import calculate_kpis
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+_PRODUCTS = pd.DataFrame({
+    "name":        ["Product A",   "Product B", "Product C"],
+    "category":    ["Electronics", "Audio",     "Office"],
+    "revenue":     [300,           150,         500],
+    "ad_spend":    [60,            100,         50],
+    "clicks":      [200,           100,         400],
+    "impressions": [5000,          4000,        8000],
+    "units_sold":  [20,            8,           40],
+})
+
+
+def _make_df(today, n_products=3, days=14):
+    """
+    Build a simple multi-product DataFrame with predictable values
+    so we can assert exact results.
+    """
+    products = _PRODUCTS.iloc[:n_products]
+    dates = pd.date_range(end=today, periods=days)
+    columns = {"date": np.repeat(dates.to_numpy(), n_products)}
+    columns.update({c: np.tile(products[c].to_numpy(), days) for c in products})
+    return pd.DataFrame(columns)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session")
+def today():
+    """
+    The date every synthetic frame in the suite ends on. Read once per
+    run, so a run that straddles midnight still sees a single "today".
+    """
+    return date.today()
+
+
+@pytest.fixture(scope="session")
+def base_df(today):
+    """Two days are enough for the aggregate and per-row KPI tests."""
+    return _make_df(today, days=2)
+
+
+@pytest.fixture(scope="session")
+def kpis_df(base_df):
+    return calculate_kpis(base_df)
+
+
+@pytest.fixture(scope="session")
+def weekly_df(today):
+    """Long enough for two full weeks plus a partial one."""
+    return _make_df(today, days=20)
+
+
+@pytest.fixture(scope="session")
+def one_day_df(today):
+    return _make_df(today, days=1)
+
+
+@pytest.fixture(scope="session")
+def single_row_df(today):
+    return _make_df(today, n_products=1, days=1)
+
+
+@pytest.fixture(scope="session")
+def single_row_kpis(single_row_df):
+    return calculate_kpis(single_row_df)
+
+
+@pytest.fixture(scope="session")
+def forecast_memory(tmp_path_factory):
+    """ARIMA model cache for this run only, shared by its forecast tests."""
+    return Memory(str(tmp_path_factory.mktemp("forecast_cache")), verbose=0)
+
@@ -1,147 +1,170 @@
 """
-Tests for the anomaly detection logic in dashboard/app.py
+Tests for analysis/anomaly_detection.py
 
-The detect_anomalies function is inlined in app.py, so we redefine it here
-to test it in isolation — no Streamlit or DB needed.
+All tests use synthetic DataFrames — no database connection required.
 """
 import pandas as pd
 import pytest
-from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
-import sys, os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-
-
-# ---------------------------------------------------------------------------
-# Replicate the function under test (from dashboard/app.py)
-# ---------------------------------------------------------------------------
-
-def detect_anomalies(df, z_threshold=1.8, window_days=7):
-    anomalies = []
-    latest_date = df["date"].max()
-    cutoff = latest_date - pd.Timedelta(days=window_days - 1)
-
-    for product, df_product in df.groupby("name"):
-        df_product = df_product.sort_values("date")
-        if len(df_product) < 14:
-            continue
-        mean = df_product["revenue"].mean()
-        std  = df_product["revenue"].std()
-        if std == 0:
-            continue
-        recent = df_product[df_product["date"] >= cutoff]
-        for _, row in recent.iterrows():
-            z = (row["revenue"] - mean) / std
-            if abs(z) > z_threshold:
-                anomalies.append({
-                    "Product":  product,
-                    "Category": row["category"],
-                    "Date":     row["date"].strftime("%b %d"),
-                    "Revenue":  f"${row['revenue']:,.0f}",
-                    "Expected": f"${mean:,.0f} ± ${std:,.0f}",
-                    "Z-Score":  round(z, 2),
-                    "Type":     "📈 Spike" if z > 0 else "📉 Drop",
-                })
-
-    return sorted(anomalies, key=lambda x: abs(x["Z-Score"]), reverse=True)
+from analysis.anomaly_detection import detect_anomalies
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _stable_df(product="Stable Product", days=30, revenue=200.0):
+def _stable_df(today, product="Stable Product", days=30, revenue=200.0):
     """All days have the same revenue — no anomalies expected."""
-    latest = date.today()
-    dates = [latest - timedelta(days=i) for i in range(days - 1, -1, -1)]
     return pd.DataFrame({
-        "date":     pd.to_datetime(dates),
+        "date":     pd.date_range(end=today, periods=days),
         "name":     product,
         "category": "Electronics",
         "revenue":  revenue,
     })
 
 
-def _df_with_spike(product="Spike Product", base=200.0, spike_value=2000.0, days=30):
+def _df_with_spike(today, product="Spike Product", base=200.0, spike_value=2000.0, days=30):
     """Last day is a massive spike."""
-    df = _stable_df(product=product, days=days, revenue=base)
+    df = _stable_df(today, product=product, days=days, revenue=base)
     df.loc[df.index[-1], "revenue"] = spike_value
     return df
 
 
-def _df_with_drop(product="Drop Product", base=200.0, drop_value=5.0, days=30):
+def _df_with_drop(today, product="Drop Product", base=200.0, drop_value=5.0, days=30):
     """Last day is a severe drop."""
-    df = _stable_df(product=product, days=days, revenue=base)
+    df = _stable_df(today, product=product, days=days, revenue=base)
     df.loc[df.index[-1], "revenue"] = drop_value
     return df
 
 
+@pytest.fixture(scope="module")
+def stable_df(today):
+    return _stable_df(today)
+
+
+@pytest.fixture(scope="module")
+def spike_df(today):
+    return _df_with_spike(today, spike_value=5000.0)
+
+
+@pytest.fixture(scope="module")
+def drop_df(today):
+    return _df_with_drop(today, drop_value=1.0)
+
+
 # ---------------------------------------------------------------------------
 # Tests
 # ---------------------------------------------------------------------------
 
 class TestNoAnomalies:
-    def test_stable_series_returns_empty(self):
-        df = _stable_df()
-        result = detect_anomalies(df)
-        assert result == [], "Expected no anomalies for a stable series"
+    def test_stable_series_returns_empty(self, stable_df):
+        result = detect_anomalies(stable_df)
+        assert result.empty, "Expected no anomalies for a stable series"
 
-    def test_insufficient_history_skipped(self):
+    def test_insufficient_history_skipped(self, today):
         # Only 10 days — below the 14-day minimum
-        df = _stable_df(days=10)
+        df = _stable_df(today, days=10)
         result = detect_anomalies(df)
-        assert result == [], "Products with < 14 days of history should be skipped"
+        assert result.empty, "Products with < 14 days of history should be skipped"
 
 
 class TestSpikeDetection:
-    def test_detects_revenue_spike(self):
-        df = _df_with_spike(spike_value=5000.0)
-        result = detect_anomalies(df)
+    def test_detects_revenue_spike(self, spike_df):
+        result = detect_anomalies(spike_df)
         assert len(result) >= 1, "Expected at least one anomaly for a spike"
-        assert result[0]["Type"] == "📈 Spike"
+        assert result.iloc[0]["Type"] == "📈 Spike"
 
-    def test_spike_has_positive_z_score(self):
-        df = _df_with_spike(spike_value=5000.0)
-        result = detect_anomalies(df)
-        assert result[0]["Z-Score"] > 0
+    def test_spike_has_positive_z_score(self, spike_df):
+        result = detect_anomalies(spike_df)
+        assert result.iloc[0]["Z-Score"] > 0
 
 
 class TestDropDetection:
-    def test_detects_revenue_drop(self):
-        df = _df_with_drop(drop_value=1.0)
-        result = detect_anomalies(df)
+    def test_detects_revenue_drop(self, drop_df):
+        result = detect_anomalies(drop_df)
         assert len(result) >= 1, "Expected at least one anomaly for a drop"
-        assert result[0]["Type"] == "📉 Drop"
+        assert result.iloc[0]["Type"] == "📉 Drop"
+
+    def test_drop_has_negative_z_score(self, drop_df):
+        result = detect_anomalies(drop_df)
+        assert result.iloc[0]["Z-Score"] < 0
 
-    def test_drop_has_negative_z_score(self):
-        df = _df_with_drop(drop_value=1.0)
+
+class TestRollingBaseline:
+    def test_level_shift_not_flagged_once_baseline_adapts(self, today):
+        # 70 days at 100 then 20 days at 300: against the full history the
+        # recent days look like spikes, against a 28-day window they don't.
+        df = _stable_df(today, days=90, revenue=100.0)
+        df.loc[df.index[-20:], "revenue"] = 300.0
         result = detect_anomalies(df)
-        assert result[0]["Z-Score"] < 0
+        assert result.empty, "Recent days should be judged against the recent baseline"
+
+    def test_empty_dataframe_returns_empty(self, stable_df):
+        assert detect_anomalies(stable_df.iloc[0:0]).empty
 
 
 class TestSortingAndStructure:
-    def test_sorted_by_absolute_z_score_descending(self):
-        df_spike = _df_with_spike("Product A", spike_value=9000.0)
-        df_drop  = _df_with_drop("Product B", drop_value=1.0)
+    def test_sorted_by_absolute_z_score_descending(self, today):
+        df_spike = _df_with_spike(today, "Product A", spike_value=9000.0)
+        df_drop  = _df_with_drop(today, "Product B", drop_value=1.0)
         df = pd.concat([df_spike, df_drop], ignore_index=True)
         result = detect_anomalies(df)
         if len(result) > 1:
-            z_scores = [abs(r["Z-Score"]) for r in result]
+            z_scores = result["Z-Score"].abs().tolist()
             assert z_scores == sorted(z_scores, reverse=True), \
                 "Anomalies should be sorted by |Z-Score| descending"
 
-    def test_result_has_required_keys(self):
-        df = _df_with_spike()
-        result = detect_anomalies(df)
+    def test_result_has_required_keys(self, spike_df):
+        result = detect_anomalies(spike_df)
         required = {"Product", "Category", "Date", "Revenue", "Expected", "Z-Score", "Type"}
-        for item in result:
-            assert required.issubset(item.keys())
+        assert required.issubset(result.columns)
 
-    def test_multiple_products(self):
-        df_a = _df_with_spike("Product A")
-        df_b = _stable_df("Product B")
+    def test_multiple_products(self, today):
+        df_a = _df_with_spike(today, "Product A")
+        df_b = _stable_df(today, "Product B")
         df = pd.concat([df_a, df_b], ignore_index=True)
         result = detect_anomalies(df)
-        products_flagged = {r["Product"] for r in result}
+        products_flagged = set(result["Product"])
         assert "Product A" in products_flagged
         assert "Product B" not in products_flagged
+
+
+class TestNumbaKernel:
+    def test_matches_pandas_rolling_path(self, monkeypatch, today):
+        from analysis import anomaly_detection
+        if anomaly_detection.njit is None:
+            pytest.skip("numba not installed")
+        df = pd.concat([
+            _df_with_spike(today, "Product A", spike_value=900.0),
+            _df_with_drop(today, "Product B", drop_value=20.0),
+            _stable_df(today, "Product C", days=12),
+        ], ignore_index=True)
+        df.loc[df.index[3], "revenue"] = 260.0
+        fast = detect_anomalies(df, z_threshold=1.0)
+        monkeypatch.setattr(anomaly_detection, "njit", None)
+        slow = detect_anomalies(df, z_threshold=1.0)
+        pd.testing.assert_frame_equal(fast, slow)
+
+    def test_concurrent_calls(self, spike_df):
+        # Streamlit sessions run detect_anomalies on separate threads; the
+        # kernel must not abort the process when they overlap.
+        expected = detect_anomalies(spike_df)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(detect_anomalies, [spike_df] * 16))
+        for result in results:
+            pd.testing.assert_frame_equal(result, expected)
+
+
+class TestCategoricalLabels:
+    def test_categorical_input_matches_object_input(self, today):
+        # load_performance() hands name/category over as categoricals
+        df = pd.concat([
+            _df_with_spike(today, "Product A"),
+            _df_with_drop(today, "Product B"),
+            _stable_df(today, "Product C"),
+        ], ignore_index=True)
+        as_categories = df.astype({"name": "category", "category": "category"})
+        pd.testing.assert_frame_equal(
+            detect_anomalies(as_categories), detect_anomalies(df)
+        )
@@ -0,0 +1,145 @@
+"""
+Tests for data_pipeline/etl.py
+
+The database connection is mocked and HTTP calls go to the simulated
+API in-process through FastAPI's TestClient, so neither PostgreSQL nor a
+running server is needed.
+"""
+import pytest
+import requests
+from datetime import timedelta
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+
+from data_pipeline import etl
+from simulated_api.main import app, PRODUCTS
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _daily_rows(today, days=3, product_id=1):
+    """One API-shaped row per day, oldest first, ending on `today`."""
+    return [
+        {
+            "date":        str(today - timedelta(days=i)),
+            "product_id":  product_id,
+            "impressions": 1000,
+            "clicks":      50,
+            "ad_spend":    20.0,
+            "units_sold":  5,
+            "revenue":     150.0,
+        }
+        for i in range(days - 1, -1, -1)
+    ]
+
+
+def _mock_connection(watermark):
+    """
+    A raw connection whose cursor answers SELECT max(date) with
+    `watermark` and records every COPY body it is sent.
+    """
+    raw = MagicMock()
+    cur = raw.cursor.return_value.__enter__.return_value
+    cur.fetchone.return_value = (watermark,)
+    cur.copied = []
+    cur.copy_expert.side_effect = lambda sql, buf: cur.copied.append(buf.getvalue())
+    return raw, cur
+
+
+def _load(rows, watermark):
+    raw, cur = _mock_connection(watermark)
+    with patch.object(etl, "_get_engine") as engine:
+        engine.return_value.raw_connection.return_value = raw
+        etl.load_daily_performance(rows, {1: "Accessories"})
+    return raw, cur
+
+
+def _copied_dates(cur):
+    return [line.split(",")[0] for body in cur.copied for line in body.splitlines()]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """
+    TestClient for the simulated API, installed as the ETL's session with
+    an empty catalog cache. Records the status code of every response.
+    """
+    client = TestClient(app)
+    client.statuses = []
+    client.event_hooks["response"].append(lambda r: client.statuses.append(r.status_code))
+    monkeypatch.setattr(etl, "SESSION", client)
+    monkeypatch.setattr(etl, "_products_cache", {"etag": None, "products": None})
+    return client
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestProductsETag:
+    def test_matching_if_none_match_gets_304(self, api):
+        etag = api.get("/products").headers["ETag"]
+        response = api.get("/products", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+    def test_stale_if_none_match_gets_full_body(self, api):
+        response = api.get("/products", headers={"If-None-Match": '"stale"'})
+        assert response.status_code == 200
+        assert response.json() == PRODUCTS
+
+    def test_fetch_products_reuses_cached_list_on_304(self, api):
+        first = etl.fetch_products()
+        second = etl.fetch_products()
+        assert api.statuses == [200, 304]
+        assert first == PRODUCTS
+        assert second is first
+
+
+class TestFetchDailyPerformance:
+    def test_json_fallback_raises_on_http_error(self, monkeypatch):
+        response = MagicMock()
+        response.raise_for_status.side_effect = requests.HTTPError("500 Server Error")
+        monkeypatch.setattr(etl, "pa", None)
+        monkeypatch.setattr(etl, "SESSION", MagicMock(**{"get.return_value": response}))
+        with pytest.raises(requests.HTTPError):
+            etl.fetch_daily_performance()
+        response.json.assert_not_called()
+
+
+class TestLoadDailyPerformance:
+    def test_rows_older_than_watermark_dropped(self, today):
+        _, cur = _load(_daily_rows(today, days=3), watermark=today - timedelta(days=1))
+        assert _copied_dates(cur) == [str(today - timedelta(days=1)), str(today)]
+
+    def test_rows_on_watermark_kept(self, today):
+        _, cur = _load(_daily_rows(today, days=3), watermark=today)
+        assert _copied_dates(cur) == [str(today)]
+
+    def test_all_rows_older_copies_nothing(self, today):
+        raw, cur = _load(_daily_rows(today - timedelta(days=5)), watermark=today)
+        cur.copy_expert.assert_not_called()
+        raw.commit.assert_called_once()
+
+    def test_empty_table_copies_every_row(self, today):
+        _, cur = _load(_daily_rows(today, days=3), watermark=None)
+        assert len(_copied_dates(cur)) == 3
+
+    def test_staged_rows_moved_with_on_conflict_do_nothing(self, today):
+        raw, cur = _load(_daily_rows(today), watermark=None)
+        sql = [" ".join(call.args[0].split()) for call in cur.execute.call_args_list]
+        assert any(s.startswith("CREATE TEMP TABLE daily_performance_stage") for s in sql)
+        assert any("FROM daily_performance_stage ON CONFLICT (date, product_id) DO NOTHING" in s for s in sql)
+        raw.commit.assert_called_once()
+
+    def test_failure_rolls_back(self, today):
+        raw, cur = _mock_connection(None)
+        cur.copy_expert.side_effect = RuntimeError("copy failed")
+        with patch.object(etl, "_get_engine") as engine:
+            engine.return_value.raw_connection.return_value = raw
+            with pytest.raises(RuntimeError):
+                etl.load_daily_performance(_daily_rows(today), {1: "Accessories"})
+        raw.rollback.assert_called_once()
+        raw.commit.assert_not_called()
@@ -1,30 +1,28 @@
 """
 Tests for analysis/forecasting.py
 
-These tests mock the database connection so no PostgreSQL instance is needed.
+These tests mock the data loader so no PostgreSQL instance is needed.
 We test the forecast output shape, column names, and edge cases.
 """
 import pandas as pd
 import pytest
 import numpy as np
-from datetime import date, timedelta
 from unittest.mock import patch, MagicMock
 
-import sys, os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from analysis import forecasting
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
-def _make_revenue_series(days=90, base=10000.0, noise=0.08, seed=42):
+def _make_revenue_series(today, days=90, base=10000.0, noise=0.08, seed=42):
     """
     Generate a realistic synthetic revenue series with weekly seasonality
     and mild trend — suitable for ARIMA fitting in tests.
     """
     rng = np.random.default_rng(seed)
-    dates = pd.date_range(end=date.today(), periods=days, freq="D")
+    dates = pd.date_range(end=today, periods=days, freq="D")
     trend = np.linspace(1.0, 1.15, days)
     weekly = np.array([1.0, 0.9, 0.95, 1.0, 1.05, 1.25, 1.20] * (days // 7 + 1))[:days]
     noise_arr = rng.normal(1.0, noise, days)
@@ -34,10 +32,20 @@ def _make_revenue_series(days=90, base=10000.0, noise=0.08, seed=42):
 
 def _patch_db(mock_df):
     """
-    Returns a context manager that patches pd.read_sql to return mock_df.
-    Also patches create_engine to avoid real DB connections.
+    Returns a context manager that patches the shared loader to return
+    mock_df, so no real DB connection (or on-disk cache) is touched.
     """
-    return patch("analysis.forecasting.pd.read_sql", return_value=mock_df)
+    return patch("analysis.forecasting.load_performance", return_value=mock_df)
+
+
+@pytest.fixture(autouse=True)
+def isolated_forecast_cache(forecast_memory, monkeypatch):
+    """
+    Point forecasting at the per-run cache, so no test reuses (or leaves
+    behind) fitted models in the real FORECAST_CACHE_DIR.
+    """
+    monkeypatch.setattr(forecasting, "_memory", forecast_memory)
+    monkeypatch.setattr(forecasting, "_fit_arima", forecast_memory.cache(forecasting._fit_arima.func))
 
 
 # ---------------------------------------------------------------------------
@@ -45,25 +53,25 @@ def _patch_db(mock_df):
 # ---------------------------------------------------------------------------
 
 class TestForecastOutputShape:
-    def test_returns_dataframe(self):
-        mock_df = _make_revenue_series()
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+    def test_returns_dataframe(self, today):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=7)
         assert isinstance(result, pd.DataFrame)
 
-    def test_forecast_has_required_columns(self):
-        mock_df = _make_revenue_series()
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+    def test_forecast_has_required_columns(self, today):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=7)
         for col in ["ds", "yhat", "yhat_lower", "yhat_upper"]:
             assert col in result.columns, f"Missing column: {col}"
 
-    def test_forecast_period_length(self):
+    def test_forecast_period_length(self, today):
         days = 14
-        mock_df = _make_revenue_series(days=90)
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+        mock_df = _make_revenue_series(today, days=90)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=days)
         # Result includes history + forecast rows
@@ -71,10 +79,10 @@ class TestForecastOutputShape:
         assert len(future) == days, \
             f"Expected {days} future rows, got {len(future)}"
 
-    def test_confidence_interval_ordering(self):
+    def test_confidence_interval_ordering(self, today):
         """yhat_lower <= yhat <= yhat_upper for all forecast rows."""
-        mock_df = _make_revenue_series()
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=10)
         future = result[result["ds"] > pd.Timestamp("today").normalize()].dropna()
@@ -85,42 +93,67 @@ class TestForecastOutputShape:
 
 
 class TestForecastEdgeCases:
-    def test_raises_on_insufficient_data(self):
+    def test_raises_on_insufficient_data(self, today):
         # Only 5 rows — below the 10-row minimum
-        mock_df = _make_revenue_series(days=5)
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+        mock_df = _make_revenue_series(today, days=5)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             with pytest.raises(ValueError, match="Not enough data"):
                 forecast_revenue(days=30)
 
-    def test_history_rows_have_null_confidence_interval(self):
+    def test_history_rows_have_null_confidence_interval(self, today):
         """Historical rows should not have confidence interval values."""
-        mock_df = _make_revenue_series()
-        with patch("analysis.forecasting.create_engine"), _patch_db(mock_df):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df):
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=10)
         history = result[result["ds"] <= pd.Timestamp("today").normalize()]
         assert history["yhat_lower"].isna().all(), \
             "Historical rows should have NaN for yhat_lower"
 
+    def test_confidence_interval_columns_are_float(self, today):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df):
+            from analysis.forecasting import forecast_revenue
+            result = forecast_revenue(days=10)
+        assert result["yhat_lower"].dtype == np.float64
+        assert result["yhat_upper"].dtype == np.float64
+
 
 class TestForecastFilters:
-    def test_product_filter_passed_through(self):
+    def test_product_filter_passed_through(self, today):
         """
         When a product_filter is set, the function should filter the DataFrame
-        before training. We verify by checking that read_sql is called once
+        before training. We verify by checking that the loader is called once
         and the result still has the right shape.
         """
-        mock_df = _make_revenue_series(days=60)
+        mock_df = _make_revenue_series(today, days=60)
         # Simulate the SQL returning rows for a single product already
         mock_df["name"] = "Wireless Mouse"
         mock_df["category"] = "Accessories"
         mock_df.rename(columns={"date": "date", "revenue": "revenue"}, inplace=True)
 
-        with patch("analysis.forecasting.create_engine"), \
-             patch("analysis.forecasting.pd.read_sql", return_value=mock_df) as mock_sql:
+        with _patch_db(mock_df) as mock_load:
             from analysis.forecasting import forecast_revenue
             result = forecast_revenue(days=7, product_filter="Wireless Mouse")
 
-        mock_sql.assert_called_once()
+        mock_load.assert_called_once()
         assert isinstance(result, pd.DataFrame)
+
+
+class TestForecastBoth:
+    def test_loads_once_and_matches_individual_forecasts(self, today):
+        mock_df = _make_revenue_series(today)
+        with _patch_db(mock_df) as mock_load:
+            from analysis.forecasting import forecast_both, forecast_revenue, forecast_revenue_ma
+            arima, ma = forecast_both(days=7)
+            assert mock_load.call_count == 1
+            pd.testing.assert_frame_equal(arima, forecast_revenue(days=7))
+            pd.testing.assert_frame_equal(ma, forecast_revenue_ma(days=7))
+
+    def test_propagates_model_errors(self, today):
+        mock_df = _make_revenue_series(today, days=5)
+        with _patch_db(mock_df):
+            from analysis.forecasting import forecast_both
+            with pytest.raises(ValueError, match="ARIMA"):
+                forecast_both(days=7)
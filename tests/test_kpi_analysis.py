@@ -4,11 +4,11 @@ Tests for analysis/kpi_analysis.py
 All tests use synthetic DataFrames — no database connection required.
 """
 import pandas as pd
+import numpy as np
 import pytest
-from datetime import date, timedelta
+from datetime import timedelta
+from unittest.mock import patch
 
-import sys, os
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from analysis.kpi_analysis import (
     calculate_kpis,
     get_top_sellers,
@@ -16,30 +16,29 @@ from analysis.kpi_analysis import (
     calculate_day_over_day_change,
     calculate_week_over_week_change,
     get_kpi_summary,
+    get_kpi_summary_from_db,
+    load_top_sellers,
 )
 
 
 # ---------------------------------------------------------------------------
-# Helpers
+# Helpers — the shared multi-product frames (base_df, kpis_df, ...) and
+# the `today` they end on are session fixtures in conftest.py.
 # ---------------------------------------------------------------------------
 
-def _make_df(n_products=3, days=14):
+_METRIC_COLUMNS = ["revenue", "ad_spend", "clicks", "impressions", "units_sold"]
+
+
+def _product_days(dates, metrics):
     """
-    Build a simple multi-product DataFrame with predictable values
-    so we can assert exact results.
+    Frame for a single product "P", one row per date. `metrics` holds one
+    row of _METRIC_COLUMNS values per date and becomes one float64 block.
     """
-    records = []
-    latest = date.today()
-    products = [
-        {"name": "Product A", "category": "Electronics", "revenue": 300, "ad_spend": 60,  "clicks": 200, "impressions": 5000, "units_sold": 20},
-        {"name": "Product B", "category": "Audio",       "revenue": 150, "ad_spend": 100, "clicks": 100, "impressions": 4000, "units_sold": 8},
-        {"name": "Product C", "category": "Office",      "revenue": 500, "ad_spend": 50,  "clicks": 400, "impressions": 8000, "units_sold": 40},
-    ]
-    for i in range(days):
-        day = latest - timedelta(days=days - 1 - i)
-        for p in products[:n_products]:
-            records.append({"date": pd.Timestamp(day), **p})
-    return pd.DataFrame(records)
+    df = pd.DataFrame(np.asarray(metrics, dtype=np.float64), columns=_METRIC_COLUMNS)
+    df.insert(0, "date", pd.to_datetime(dates))
+    df.insert(1, "name", "P")
+    df.insert(2, "category", "X")
+    return df
 
 
 # ---------------------------------------------------------------------------
@@ -47,48 +46,31 @@ def _make_df(n_products=3, days=14):
 # ---------------------------------------------------------------------------
 
 class TestCalculateKPIs:
-    def test_adds_all_metric_columns(self):
-        df = _make_df()
-        result = calculate_kpis(df)
+    def test_adds_all_metric_columns(self, kpis_df):
         for col in ["CTR", "conversion_rate", "ROAS", "ACOS", "CPC"]:
-            assert col in result.columns, f"Missing column: {col}"
-
-    def test_ctr_calculation(self):
-        df = _make_df(n_products=1)
-        result = calculate_kpis(df)
-        # Product A: clicks=200, impressions=5000 → CTR=0.04
-        assert abs(result["CTR"].iloc[0] - 0.04) < 1e-6
-
-    def test_roas_calculation(self):
-        df = _make_df(n_products=1)
-        result = calculate_kpis(df)
-        # Product A: revenue=300, ad_spend=60 → ROAS=5.0
-        assert abs(result["ROAS"].iloc[0] - 5.0) < 1e-6
-
-    def test_acos_calculation(self):
-        df = _make_df(n_products=1)
-        result = calculate_kpis(df)
-        # Product A: ad_spend=60, revenue=300 → ACOS=0.2
-        assert abs(result["ACOS"].iloc[0] - 0.2) < 1e-6
-
-    def test_cpc_calculation(self):
-        df = _make_df(n_products=1)
-        result = calculate_kpis(df)
-        # Product A: ad_spend=60, clicks=200 → CPC=0.3
-        assert abs(result["CPC"].iloc[0] - 0.3) < 1e-6
-
-    def test_no_division_by_zero_on_zero_clicks(self):
-        df = _make_df(n_products=1)
+            assert col in kpis_df.columns, f"Missing column: {col}"
+
+    # Product A: clicks=200, impressions=5000, revenue=300, ad_spend=60
+    @pytest.mark.parametrize("col,expected", [
+        ("CTR",  0.04),  # 200 / 5000
+        ("ROAS", 5.0),   # 300 / 60
+        ("ACOS", 0.2),   # 60 / 300
+        ("CPC",  0.3),   # 60 / 200
+    ])
+    def test_metric_calculation(self, single_row_kpis, col, expected):
+        assert abs(single_row_kpis[col].iloc[0] - expected) < 1e-6
+
+    def test_no_division_by_zero_on_zero_clicks(self, single_row_df):
+        df = single_row_df.copy()
         df["clicks"] = 0
         result = calculate_kpis(df)
         assert result["conversion_rate"].notna().all()
         assert result["CPC"].notna().all()
 
-    def test_does_not_modify_original_df(self):
-        df = _make_df()
-        original_cols = list(df.columns)
-        calculate_kpis(df)
-        assert list(df.columns) == original_cols, "calculate_kpis should not mutate input"
+    def test_does_not_modify_original_df(self, base_df):
+        original_cols = list(base_df.columns)
+        calculate_kpis(base_df)
+        assert list(base_df.columns) == original_cols, "calculate_kpis should not mutate input"
 
 
 # ---------------------------------------------------------------------------
@@ -96,20 +78,18 @@ class TestCalculateKPIs:
 # ---------------------------------------------------------------------------
 
 class TestGetTopSellers:
-    def test_returns_correct_top_product(self):
-        df = calculate_kpis(_make_df())
-        top = get_top_sellers(df, top_n=1)
+    def test_returns_correct_top_product(self, kpis_df):
+        top = get_top_sellers(kpis_df, top_n=1)
         # Product C has revenue=500/day → highest total
         assert top.index[0] == "Product C"
 
-    def test_respects_top_n(self):
-        df = calculate_kpis(_make_df())
-        top = get_top_sellers(df, top_n=2)
-        assert len(top) == 2
+    @pytest.mark.parametrize("top_n", [1, 2, 3])
+    def test_respects_top_n(self, kpis_df, top_n):
+        top = get_top_sellers(kpis_df, top_n=top_n)
+        assert len(top) == top_n
 
-    def test_sorted_descending(self):
-        df = calculate_kpis(_make_df())
-        top = get_top_sellers(df, top_n=3)
+    def test_sorted_descending(self, kpis_df):
+        top = get_top_sellers(kpis_df, top_n=3)
         assert list(top.values) == sorted(top.values, reverse=True)
 
 
@@ -118,20 +98,18 @@ class TestGetTopSellers:
 # ---------------------------------------------------------------------------
 
 class TestGetWorstPerformers:
-    def test_returns_lowest_roas_first(self):
-        df = calculate_kpis(_make_df())
-        worst = get_worst_performers(df, top_n=1)
+    def test_returns_lowest_roas_first(self, kpis_df):
+        worst = get_worst_performers(kpis_df, top_n=1)
         # Product B: ROAS = 150/100 = 1.5 → worst
         assert worst.index[0] == "Product B"
 
-    def test_respects_top_n(self):
-        df = calculate_kpis(_make_df())
-        worst = get_worst_performers(df, top_n=2)
-        assert len(worst) == 2
+    @pytest.mark.parametrize("top_n", [1, 2, 3])
+    def test_respects_top_n(self, kpis_df, top_n):
+        worst = get_worst_performers(kpis_df, top_n=top_n)
+        assert len(worst) == top_n
 
-    def test_sorted_ascending(self):
-        df = calculate_kpis(_make_df())
-        worst = get_worst_performers(df, top_n=3)
+    def test_sorted_ascending(self, kpis_df):
+        worst = get_worst_performers(kpis_df, top_n=3)
         assert list(worst.values) == sorted(worst.values)
 
 
@@ -140,27 +118,26 @@ class TestGetWorstPerformers:
 # ---------------------------------------------------------------------------
 
 class TestDayOverDayChange:
-    def test_returns_none_with_single_day(self):
-        df = _make_df(days=1)
-        result = calculate_day_over_day_change(df)
+    def test_returns_none_with_single_day(self, one_day_df):
+        result = calculate_day_over_day_change(one_day_df)
         assert result is None
 
-    def test_positive_change_when_revenue_increases(self):
-        latest = date.today()
-        df = pd.DataFrame([
-            {"date": pd.Timestamp(latest - timedelta(days=1)), "name": "P", "category": "X", "revenue": 100, "ad_spend": 10, "clicks": 50, "impressions": 1000, "units_sold": 5},
-            {"date": pd.Timestamp(latest),                     "name": "P", "category": "X", "revenue": 200, "ad_spend": 10, "clicks": 50, "impressions": 1000, "units_sold": 10},
-        ])
+    def test_positive_change_when_revenue_increases(self, today):
+        df = _product_days(
+            [today - timedelta(days=1), today],
+            [[100, 10, 50, 1000, 5],
+             [200, 10, 50, 1000, 10]],
+        )
         result = calculate_day_over_day_change(df)
         assert result["P"] == pytest.approx(100.0)  # +100%
 
-    def test_uses_sorted_dates(self):
+    def test_uses_sorted_dates(self, today):
         # Dates inserted in reverse order — function should still pick last two correctly
-        latest = date.today()
-        df = pd.DataFrame([
-            {"date": pd.Timestamp(latest),                     "name": "P", "category": "X", "revenue": 200, "ad_spend": 10, "clicks": 50, "impressions": 1000, "units_sold": 10},
-            {"date": pd.Timestamp(latest - timedelta(days=1)), "name": "P", "category": "X", "revenue": 100, "ad_spend": 10, "clicks": 50, "impressions": 1000, "units_sold": 5},
-        ])
+        df = _product_days(
+            [today, today - timedelta(days=1)],
+            [[200, 10, 50, 1000, 10],
+             [100, 10, 50, 1000, 5]],
+        )
         result = calculate_day_over_day_change(df)
         assert result["P"] == pytest.approx(100.0)
 
@@ -170,27 +147,25 @@ class TestDayOverDayChange:
 # ---------------------------------------------------------------------------
 
 class TestWeekOverWeekChange:
-    def test_returns_dataframe(self):
-        df = _make_df(days=20)
-        result = calculate_week_over_week_change(df)
+    def test_returns_dataframe(self, weekly_df):
+        result = calculate_week_over_week_change(weekly_df)
         assert isinstance(result, pd.DataFrame)
 
-    def test_has_required_columns(self):
-        df = _make_df(days=20)
-        result = calculate_week_over_week_change(df)
+    def test_has_required_columns(self, weekly_df):
+        result = calculate_week_over_week_change(weekly_df)
         for col in ["name", "this_week", "last_week", "change_pct"]:
             assert col in result.columns
 
-    def test_positive_change_when_recent_week_higher(self):
-        latest = date.today()
-        records = []
-        # Last 7 days: revenue=200/day
-        for i in range(7):
-            records.append({"date": pd.Timestamp(latest - timedelta(days=i)), "name": "P", "category": "X", "revenue": 200, "ad_spend": 20, "clicks": 100, "impressions": 2000, "units_sold": 10})
-        # Previous 7 days: revenue=100/day
-        for i in range(7, 14):
-            records.append({"date": pd.Timestamp(latest - timedelta(days=i)), "name": "P", "category": "X", "revenue": 100, "ad_spend": 20, "clicks": 100, "impressions": 2000, "units_sold": 5})
-        df = pd.DataFrame(records)
+    def test_positive_change_when_recent_week_higher(self, today):
+        # Days ago 0..6: revenue=200/day; days ago 7..13: revenue=100/day
+        days_ago = np.arange(14)
+        recent = days_ago < 7
+        df = pd.DataFrame({
+            "date": pd.to_datetime(today) - pd.to_timedelta(days_ago, unit="D"),
+            "name": "P", "category": "X",
+            "revenue": np.where(recent, 200, 100), "ad_spend": 20, "clicks": 100,
+            "impressions": 2000, "units_sold": np.where(recent, 10, 5),
+        })
         result = calculate_week_over_week_change(df)
         assert result.loc[result["name"] == "P", "change_pct"].values[0] == pytest.approx(100.0)
 
@@ -200,14 +175,12 @@ class TestWeekOverWeekChange:
 # ---------------------------------------------------------------------------
 
 class TestGetKPISummary:
-    def test_returns_dict(self):
-        df = _make_df()
-        result = get_kpi_summary(df)
+    def test_returns_dict(self, base_df):
+        result = get_kpi_summary(base_df)
         assert isinstance(result, dict)
 
-    def test_has_all_keys(self):
-        df = _make_df()
-        result = get_kpi_summary(df)
+    def test_has_all_keys(self, base_df):
+        result = get_kpi_summary(base_df)
         expected_keys = {
             "total_revenue", "total_ad_spend", "total_clicks",
             "total_impressions", "total_units_sold", "avg_roas",
@@ -216,21 +189,19 @@ class TestGetKPISummary:
         }
         assert expected_keys.issubset(result.keys())
 
-    def test_total_revenue_is_correct(self):
-        df = _make_df(n_products=1, days=1)
+    def test_total_revenue_is_correct(self, single_row_df):
         # Product A: revenue=300 for 1 day
-        result = get_kpi_summary(df)
+        result = get_kpi_summary(single_row_df)
         assert result["total_revenue"] == pytest.approx(300.0)
 
-    def test_avg_roas_uses_totals_not_mean_of_means(self):
+    def test_avg_roas_uses_totals_not_mean_of_means(self, single_row_df):
         # Correct ROAS = sum(revenue) / sum(ad_spend), not mean of per-row ROAS
-        df = _make_df(n_products=1, days=1)
-        result = get_kpi_summary(df)
+        result = get_kpi_summary(single_row_df)
         # Product A: revenue=300, ad_spend=60 → ROAS=5.0
         assert result["avg_roas"] == pytest.approx(5.0)
 
-    def test_no_division_by_zero_on_empty_ish_data(self):
-        df = _make_df(n_products=1, days=1)
+    def test_no_division_by_zero_on_empty_ish_data(self, single_row_df):
+        df = single_row_df.copy()
         df["clicks"] = 0
         df["ad_spend"] = 0
         df["revenue"] = 0
@@ -238,3 +209,29 @@ class TestGetKPISummary:
         # Should not raise, all values should be 0 or safe defaults
         assert result["avg_roas"] == 0.0
         assert result["avg_ctr"] == 0.0
+
+
+# ---------------------------------------------------------------------------
+# Database-side aggregation (read_query mocked)
+# ---------------------------------------------------------------------------
+
+class TestDatabaseAggregation:
+    def test_summary_from_db_matches_dataframe_summary(self, base_df):
+        df = base_df
+        totals = pd.DataFrame([{
+            "total_revenue":     df["revenue"].sum(),
+            "total_ad_spend":    df["ad_spend"].sum(),
+            "total_clicks":      df["clicks"].sum(),
+            "total_impressions": df["impressions"].sum(),
+            "total_units_sold":  df["units_sold"].sum(),
+        }])
+        with patch("analysis.kpi_analysis.read_query", return_value=totals):
+            result = get_kpi_summary_from_db()
+        assert result == get_kpi_summary(df)
+
+    def test_top_sellers_indexed_by_product(self):
+        rows = pd.DataFrame({"name": ["Product C", "Product A"], "revenue": [7000.0, 4200.0]})
+        with patch("analysis.kpi_analysis.read_query", return_value=rows):
+            top = load_top_sellers(top_n=2)
+        assert list(top.index) == ["Product C", "Product A"]
+        assert top.iloc[0] == pytest.approx(7000.0)
@@ -0,0 +1,209 @@
+"""
+Tests for analysis/_loader.py
+
+The SQL read is mocked, and the on-disk cache is pointed
+at a temporary directory, so no PostgreSQL instance is needed.
+"""
+import pandas as pd
+import pytest
+import os
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from analysis import _loader
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _make_db_df(today, days=5):
+    return pd.DataFrame({
+        "date":        [today - timedelta(days=i) for i in range(days - 1, -1, -1)],
+        "name":        "Product A",
+        "category":    "Electronics",
+        "impressions": 1000,
+        "clicks":      50,
+        "ad_spend":    20.0,
+        "units_sold":  5,
+        "revenue":     150.0,
+    })
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(_loader, "CACHE_PATH", str(tmp_path / "perf_cache.parquet"))
+    _loader.clear_cache()
+    yield
+    _loader.clear_cache()
+
+
+def _patch_read_sql(df):
+    return patch("analysis._loader.read_query", side_effect=lambda *a, **k: df.copy())
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+class TestLoadPerformance:
+    def test_parses_dates(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            df = _loader.load_performance()
+        assert pd.api.types.is_datetime64_any_dtype(df["date"])
+
+    def test_queries_database_once_within_ttl(self, today):
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance()
+            _loader.load_performance()
+        mock_sql.assert_called_once()
+
+    def test_adding_columns_does_not_leak_into_cache(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            df = _loader.load_performance()
+            df["extra"] = 1
+            assert "extra" not in _loader.load_performance().columns
+
+
+class TestParquetCache:
+    def test_fresh_file_skips_database(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            _loader.load_performance()
+        _loader._load_cached.cache_clear()  # simulate a new process
+
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            df = _loader.load_performance()
+        mock_sql.assert_not_called()
+        assert len(df) == 5
+
+    def test_stale_file_is_ignored(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            _loader.load_performance()
+        _loader._load_cached.cache_clear()
+        stale = time.time() - _loader.CACHE_TTL_SECONDS - 1
+        os.utime(_loader.CACHE_PATH, (stale, stale))
+
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance()
+        mock_sql.assert_called_once()
+
+    def test_written_via_temp_file_then_renamed(self, monkeypatch, today):
+        targets = []
+        to_parquet = pd.DataFrame.to_parquet
+        def spy(self, target, *args, **kwargs):
+            targets.append(getattr(target, "name", target))
+            return to_parquet(self, target, *args, **kwargs)
+        monkeypatch.setattr(pd.DataFrame, "to_parquet", spy)
+        with _patch_read_sql(_make_db_df(today)):
+            _loader.load_performance()
+        cache_dir = os.path.dirname(_loader.CACHE_PATH)
+        assert targets[0] != _loader.CACHE_PATH
+        assert os.path.dirname(targets[0]) == cache_dir
+        assert os.listdir(cache_dir) == [os.path.basename(_loader.CACHE_PATH)]
+
+    def test_failed_write_leaves_no_partial_file(self, monkeypatch, today):
+        def fail(self, *args, **kwargs):
+            raise OSError("disk full")
+        monkeypatch.setattr(pd.DataFrame, "to_parquet", fail)
+        with _patch_read_sql(_make_db_df(today)):
+            assert len(_loader.load_performance()) == 5
+        assert os.listdir(os.path.dirname(_loader.CACHE_PATH)) == []
+
+
+class TestReadQuery:
+    def test_chunked_read_returns_all_rows(self, monkeypatch, today):
+        from sqlalchemy import create_engine
+        engine = create_engine("sqlite://")
+        _make_db_df(today, days=7).to_sql("daily_performance", engine, index=False)
+        monkeypatch.setattr(_loader, "cx", None)
+        with patch("analysis._loader.get_engine", return_value=engine):
+            df = _loader.read_query("SELECT * FROM daily_performance", chunksize=3)
+        assert len(df) == 7
+        assert list(df.index) == list(range(7))
+
+
+class TestDowncast:
+    def test_counts_int32_and_money_float64(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            df = _loader.load_performance()
+        for col in ["impressions", "clicks", "units_sold"]:
+            assert df[col].dtype == "int32"
+        for col in ["ad_spend", "revenue"]:
+            assert df[col].dtype == "float64"
+
+    def test_labels_are_categorical(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            df = _loader.load_performance()
+        assert isinstance(df["name"].dtype, pd.CategoricalDtype)
+        assert isinstance(df["category"].dtype, pd.CategoricalDtype)
+
+    def test_null_counts_fall_back_to_float64(self, today):
+        db_df = _make_db_df(today)
+        db_df["clicks"] = db_df["clicks"].astype("float64")
+        db_df.loc[0, "clicks"] = None
+        with _patch_read_sql(db_df):
+            df = _loader.load_performance()
+        assert df["clicks"].dtype == "float64"
+
+
+class TestHistoryWindow:
+    def test_days_back_filters_in_sql(self, today):
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance(days_back=90)
+        query = mock_sql.call_args.args[0]
+        assert "INTERVAL '90 days'" in query
+
+    def test_full_history_has_no_date_filter(self, today):
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance()
+        assert "INTERVAL" not in mock_sql.call_args.args[0]
+
+    def test_windows_are_cached_separately(self, today):
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance()
+            _loader.load_performance(days_back=90)
+            _loader.load_performance(days_back=90)
+        assert mock_sql.call_count == 2
+        assert os.path.exists(_loader._cache_path(90))
+
+
+class TestFilterPushdown:
+    def test_product_filter_is_bound_as_parameter(self, today):
+        with _patch_read_sql(_make_db_df(today)) as mock_sql:
+            _loader.load_performance(product="Product A")
+        query = mock_sql.call_args.args[0]
+        assert "p.name = :product" in query
+        assert "p.category" not in query.split("WHERE")[1]
+        assert mock_sql.call_args.kwargs["params"] == {"product": "Product A"}
+
+    def test_filtered_loads_skip_disk_cache(self, today):
+        with _patch_read_sql(_make_db_df(today)):
+            _loader.load_performance(category="Electronics")
+        assert not os.path.exists(_loader.CACHE_PATH)
+
+    def test_parameterized_read_against_sqlite(self, monkeypatch, today):
+        from sqlalchemy import create_engine
+        engine = create_engine("sqlite://")
+        _make_db_df(today, days=3).to_sql("daily_performance", engine, index=False)
+        monkeypatch.setattr(_loader, "cx", None)
+        with patch("analysis._loader.get_engine", return_value=engine):
+            hit  = _loader.read_query("SELECT * FROM daily_performance WHERE name = :product",
+                                      params={"product": "Product A"})
+            miss = _loader.read_query("SELECT * FROM daily_performance WHERE name = :product",
+                                      params={"product": "Nope"})
+        assert len(hit) == 3
+        assert miss.empty
+
+
+class TestEngine:
+    def test_engine_is_shared_and_pooled(self):
+        _loader.get_engine.cache_clear()
+        with patch("analysis._loader.create_engine") as mock_create:
+            first, second = _loader.get_engine(), _loader.get_engine()
+        _loader.get_engine.cache_clear()
+        assert first is second
+        mock_create.assert_called_once()
+        kwargs = mock_create.call_args.kwargs
+        assert kwargs["pool_size"] == _loader.POOL_SIZE
+        assert kwargs["pool_pre_ping"] is True